@@ -0,0 +1,152 @@
+"""
+Answers many degrees-of-separation queries against one loaded graph.
+
+Reads one pair of names per line, separated by a tab, from a file or
+stdin, and writes one JSON object per pair to stdout as soon as it is
+answered, in input order:
+
+    python batch.py large pairs.tsv --processes 8 --snapshot
+
+The data is loaded once, before the worker processes start. Where the
+platform forks, workers inherit it instead of loading it again; with
+--snapshot the graph is memory-mapped, so they share the same pages.
+
+With --source-trees, each worker answers from a cached single-source
+tree per source person (see distances.py), which pays off when many
+pairs share a source.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+
+import degrees
+from distances import TreeCache
+
+# Keyword arguments for degrees.shortest_path, set in each worker
+search_options = {}
+
+# Per-worker TreeCache when answering from single-source trees
+trees = None
+
+# DISAMBIGUATION policy for names shared by several people
+policy = "none"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer degrees-of-separation queries in bulk.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("pairs", nargs="?", default="-",
+                        help="file of tab-separated name pairs, or - for stdin")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--bidirectional", action="store_true")
+    parser.add_argument("--early-exit", action="store_true")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--snapshot", action="store_true")
+    parser.add_argument("--source-trees", action="store_true",
+                        help="answer from cached single-source trees")
+    parser.add_argument("--neighbor-cache", type=int, default=0,
+                        metavar="PAIRS",
+                        help="cache up to this many neighbor pairs per worker")
+    parser.add_argument("--disambiguate", default="none",
+                        choices=["none", *degrees.DISAMBIGUATION],
+                        help="how to pick among people who share a name")
+    args = parser.parse_args()
+
+    load_options = {"compact": args.compact, "snapshot": args.snapshot}
+    options = {"bidirectional": args.bidirectional,
+               "early_exit": args.early_exit}
+    if args.source_trees:
+        options = {"source_trees": True}
+    options["disambiguate"] = args.disambiguate
+    options["neighbor_cache"] = args.neighbor_cache
+    degrees.load_data(args.directory, **load_options)
+
+    f = sys.stdin if args.pairs == "-" else open(args.pairs, encoding="utf-8")
+    with f:
+        for result in run_batch(read_pairs(f), args.directory,
+                                load_options, options, args.processes):
+            print(json.dumps(result), flush=True)
+
+
+def read_pairs(lines):
+    """
+    Yields (source, target) name pairs from tab-separated lines,
+    skipping blank ones.
+    """
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        source, _, target = line.partition("\t")
+        yield source.strip(), target.strip()
+
+
+def run_batch(pairs, directory, load_options, options, processes=None):
+    """
+    Yields a result dict for each (source, target) pair, in order.
+
+    With processes=1 the queries run in this process; otherwise they
+    are spread across a pool of worker processes.
+    """
+    if processes == 1:
+        init_worker(directory, load_options, options)
+        yield from map(answer, pairs)
+        return
+
+    with multiprocessing.Pool(processes, init_worker,
+                              (directory, load_options, options)) as pool:
+        yield from pool.imap(answer, pairs, chunksize=16)
+
+
+def init_worker(directory, load_options, options):
+    """
+    Prepares a worker process, loading the data only if it was not
+    inherited from the parent.
+    """
+    global trees, policy
+    search_options.clear()
+    search_options.update(options)
+    policy = search_options.pop("disambiguate", "none")
+    budget = search_options.pop("neighbor_cache", 0)
+    if search_options.pop("source_trees", False):
+        trees = TreeCache(directory=directory)
+    if not degrees.people:
+        degrees.load_data(directory, **load_options)
+    degrees.cache_neighbors(budget)
+
+
+def answer(pair):
+    """
+    Returns the result dict for one (source, target) name pair.
+    """
+    source_name, target_name = pair
+    result = {"source": source_name, "target": target_name}
+    try:
+        source = degrees.resolve(source_name, policy)
+        target = degrees.resolve(target_name, policy)
+    except LookupError as e:
+        result["error"] = str(e)
+        return result
+
+    if trees is not None:
+        path = trees.shortest_path(source, target)
+    else:
+        path = degrees.shortest_path(source, target, **search_options)
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [
+            {"movie_id": movie_id, "person_id": person_id}
+            for movie_id, person_id in path
+        ]
+    return result
+
+
+if __name__ == "__main__":
+    main()
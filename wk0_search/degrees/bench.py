@@ -0,0 +1,204 @@
+"""
+Benchmarks degrees.shortest_path on synthetic scale-free data.
+
+Generates people, movies and stars CSV files with power-law cast sizes
+and preferential attachment, so a few actors appear in many movies and
+most in only one or two, like the real dataset. Then runs each search
+variant over the same seeded query set and reports latency
+percentiles, nodes expanded and peak memory:
+
+    python bench.py --people 50000 --movies 20000 --output bench.json
+
+Results are also written as JSON so runs can be compared over time.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+import degrees
+from graph import peak_rss
+from util import SearchStats, percentiles
+
+# Keyword arguments for degrees.shortest_path per variant
+VARIANTS = {
+    "bfs": {},
+    "early-exit": {"early_exit": True},
+    "bidirectional": {"bidirectional": True},
+}
+
+# Keyword arguments for degrees.load_data per data model
+MODELS = {
+    "dict": {},
+    "compact": {"compact": True},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark degrees searches on synthetic data.")
+    parser.add_argument("--data", help="directory to generate the data in "
+                        "(reused if it already has CSV files)")
+    parser.add_argument("--people", type=int, default=20000)
+    parser.add_argument("--movies", type=int, default=8000)
+    parser.add_argument("--alpha", type=float, default=1.5,
+                        help="power-law exponent of cast sizes")
+    parser.add_argument("--max-cast", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--variants", default="early-exit,bidirectional",
+                        help=f"comma-separated, from {', '.join(VARIANTS)}")
+    parser.add_argument("--models", default="dict,compact",
+                        help=f"comma-separated, from {', '.join(MODELS)}")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the tracemalloc pass for peak memory")
+    parser.add_argument("--output", help="file to write JSON results to")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.data or scratch
+        if not os.path.exists(os.path.join(directory, "stars.csv")):
+            os.makedirs(directory, exist_ok=True)
+            generate(directory, args.people, args.movies,
+                     args.alpha, args.max_cast, args.seed)
+
+        results = {
+            "config": {
+                "people": args.people, "movies": args.movies,
+                "alpha": args.alpha, "max_cast": args.max_cast,
+                "queries": args.queries, "seed": args.seed,
+                "python": platform.python_version(),
+            },
+            "runs": []
+        }
+        for model in args.models.split(","):
+            started = perf_counter()
+            degrees.load_data(directory, **MODELS[model])
+            load_seconds = perf_counter() - started
+            queries = query_set(args.queries, args.seed)
+            for variant in args.variants.split(","):
+                run = run_queries(queries, VARIANTS[variant],
+                                  memory=not args.no_memory)
+                run.update(model=model, variant=variant,
+                           load_seconds=load_seconds)
+                results["runs"].append(run)
+                print(summary(run))
+        results["peak_rss"] = peak_rss()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def generate(directory, n_people, n_movies, alpha=1.5, max_cast=60, seed=1):
+    """
+    Writes synthetic people.csv, movies.csv and stars.csv files to
+    directory. Cast sizes follow a power law with exponent alpha,
+    and each cast member is, half the time, someone picked in
+    proportion to how many movies they are already in.
+    """
+    rng = random.Random(seed)
+    with open(os.path.join(directory, "people.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(n_people):
+            writer.writerow([i + 1, f"Person {i + 1}", rng.randint(1920, 2005)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(n_movies):
+            writer.writerow([i + 1, f"Movie {i + 1}", rng.randint(1930, 2020)])
+
+    # Every appearance so far, so choosing from it favors busy actors
+    appearances = []
+    with open(os.path.join(directory, "stars.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie_id in range(1, n_movies + 1):
+            # A cast can't have more distinct people than there are
+            size = min(max_cast, n_people, int(rng.paretovariate(alpha)))
+            cast = set()
+            while len(cast) < size:
+                if appearances and rng.random() < 0.5:
+                    cast.add(rng.choice(appearances))
+                else:
+                    cast.add(rng.randint(1, n_people))
+            for person_id in cast:
+                writer.writerow([person_id, movie_id])
+                appearances.append(person_id)
+
+
+def query_set(n, seed):
+    """
+    Returns n (source, target) pairs of people who are in at least
+    one movie, the same for a given seed and data.
+    """
+    candidates = sorted(
+        person_id for person_id in degrees.people
+        if degrees.people[person_id]["movies"]
+    )
+    rng = random.Random(seed)
+    return [(rng.choice(candidates), rng.choice(candidates))
+            for _ in range(n)]
+
+
+def run_queries(queries, options, memory=True):
+    """
+    Times each query, then runs them all again with SearchStats for
+    nodes expanded and frontier sizes, and with memory=True under
+    tracemalloc for peak memory, so neither skews the timings.
+    """
+    latencies = []
+    connected = 0
+    for source, target in queries:
+        started = perf_counter()
+        path = degrees.shortest_path(source, target, **options)
+        latencies.append(perf_counter() - started)
+        connected += path is not None
+
+    expanded = []
+    frontiers = []
+    if memory:
+        tracemalloc.start()
+    for source, target in queries:
+        stats = SearchStats()
+        degrees.shortest_path(source, target, stats=stats, **options)
+        expanded.append(stats.nodes_expanded)
+        frontiers.append(stats.max_frontier)
+
+    run = {
+        "options": options,
+        "queries": len(queries),
+        "connected": connected,
+        "latency": percentiles(latencies),
+        "expanded": percentiles(expanded),
+        "max_frontier": percentiles(frontiers),
+        "total_seconds": sum(latencies),
+    }
+    if memory:
+        run["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return run
+
+
+def summary(run):
+    latency = run["latency"]
+    line = (f"{run['model']:8} {run['variant']:14} "
+            f"p50 {latency['p50'] * 1000:8.2f}ms "
+            f"p90 {latency['p90'] * 1000:8.2f}ms "
+            f"p99 {latency['p99'] * 1000:8.2f}ms "
+            f"expanded p50 {run['expanded']['p50']:>7}")
+    if "peak_traced_bytes" in run:
+        line += f" peak {run['peak_traced_bytes'] / 2 ** 20:6.1f} MiB"
+    return line
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
+import argparse
 import csv
 import sys
+from datetime import date
+from itertools import islice
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import CompactGraph
+from nameindex import NameIndex
+from util import (Node, StackFrontier, QueueFrontier, PriorityFrontier,
+                  SearchStats, NeighborCache)
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +18,54 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Maps person_ids to the label of their connected component
+components = {}
 
-def load_data(directory):
+# Number of people in each connected component, indexed by label
+component_sizes = []
+
+# Compact integer-indexed graph, set when loading with compact=True
+graph = None
+
+# NameIndex over names, built on first use after each load
+name_index = None
+
+# NeighborCache used by shortest_path, set by cache_neighbors
+neighbor_cache = None
+
+
+def load_data(directory, compact=False, snapshot=False,
+              years=None, movie_ids=None):
     """
     Load data from CSV files into memory.
+
+    With compact=True the data is loaded into a CompactGraph instead,
+    and names, people and movies become read-only views of it.
+    snapshot=True also loads a compact graph, memory-mapped from a
+    binary snapshot next to the CSV files when it is up to date, and
+    otherwise writes one for next time.
+
+    years, a (first, last) range, and movie_ids keep only the matching
+    movies. They always load a compact graph, streamed from the CSV
+    files, since a snapshot holds the unfiltered data.
     """
+    global graph, names, people, movies, components, component_sizes
+    global name_index, neighbor_cache
+    name_index = None
+    neighbor_cache = None
+    filtered = years is not None or movie_ids is not None
+    if compact or snapshot or filtered:
+        if snapshot and not filtered:
+            graph = CompactGraph.from_directory(directory)
+        else:
+            graph = CompactGraph.from_csv(directory, years, movie_ids)
+        names, people, movies = graph.names, graph.people, graph.movies
+        components, component_sizes = {}, graph.component_sizes
+        return
+    if graph is not None:
+        graph = None
+        names, people, movies = {}, {}, {}
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -51,16 +100,96 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    components, component_sizes = label_components()
+
+
+def label_components():
+    """
+    Labels the connected components of the loaded people with
+    union-find over each movie's stars. Returns a dict of person_id
+    to label, numbered from 0, and a list of component sizes.
+    """
+    parent = {person_id: person_id for person_id in people}
+
+    def find(person_id):
+        while parent[person_id] != person_id:
+            parent[person_id] = parent[parent[person_id]]
+            person_id = parent[person_id]
+        return person_id
+
+    for movie in movies.values():
+        stars = iter(movie["stars"])
+        first = next(stars, None)
+        if first is None:
+            continue
+        root = find(first)
+        for person_id in stars:
+            other = find(person_id)
+            if other != root:
+                parent[other] = root
+
+    labels = {}
+    sizes = []
+    for person_id in people:
+        root = find(person_id)
+        if root not in labels:
+            labels[root] = len(sizes)
+            sizes.append(0)
+        labels[person_id] = labels[root]
+        sizes[labels[person_id]] += 1
+    return labels, sizes
+
+
+def component_of(person_id):
+    """
+    Returns the label of the connected component a person is in.
+    """
+    if graph is not None:
+        return graph.component[graph.person_index(person_id)]
+    return components[person_id]
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two actors.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    parser.add_argument("--early-exit", action="store_true",
+                        help="test for the target as neighbors are generated")
+    parser.add_argument("--compact", action="store_true",
+                        help="load the data into a compact integer graph")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="cache the compact graph in a binary snapshot")
+    parser.add_argument("--years", metavar="FIRST-LAST",
+                        help="only use movies from these years, e.g. 1990-2000")
+    parser.add_argument("--stats", action="store_true",
+                        help="report loader and search statistics")
+    parser.add_argument("--prefer", choices=["recent", "popular"],
+                        help="find the cheapest path favoring these movies")
+    parser.add_argument("--released", metavar="FIRST-LAST",
+                        help="only connect people through movies from these years")
+    parser.add_argument("--all-paths", type=int, default=0, metavar="K",
+                        help="also count the shortest paths and list up to K")
+    parser.add_argument("--components", action="store_true",
+                        help="print connected component sizes and exit")
+    args = parser.parse_args()
+    directory = args.directory
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, compact=args.compact, snapshot=args.snapshot,
+              years=parse_years(args.years))
     print("Data loaded.")
+    if args.stats and graph is not None and graph.load_stats is not None:
+        print(graph.load_stats)
+
+    if args.components:
+        sizes = sorted(component_sizes, reverse=True)
+        print(f"{len(sizes)} components, "
+              f"{sizes.count(1)} of them a single person.")
+        print("Largest:", ", ".join(str(size) for size in sizes[:10]))
+        return
 
     source = person_id_for_name(input("Name: ").strip())
     if source is None:
@@ -69,7 +198,23 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    stats = SearchStats() if args.stats else None
+    if args.prefer or args.released:
+        weights = {"recent": prefer_recent(), "popular": prefer_popular()}
+        released = parse_years(args.released)
+        path = weighted_path(source, target,
+                             weight=weights.get(args.prefer),
+                             edge_filter=released and released_between(*released),
+                             stats=stats)
+    else:
+        path = shortest_path(source, target,
+                             bidirectional=args.bidirectional,
+                             early_exit=args.early_exit,
+                             stats=stats)
+    if stats is not None:
+        print(f"Expanded {stats.nodes_expanded} nodes in "
+              f"{len(stats.layer_times)} layers, max frontier "
+              f"{stats.max_frontier}, explored {stats.explored}.")
 
     if path is None:
         print("Not connected.")
@@ -83,53 +228,530 @@ def main():
             movie = movies[path[i + 1][0]]["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
+        if args.all_paths:
+            print(f"{count_shortest_paths(source, target)} shortest paths.")
+            for other in islice(all_shortest_paths(source, target), args.all_paths):
+                print(" -> ".join(people[person_id]["name"]
+                                  for _, person_id in [(None, source)] + other))
+
 
-def shortest_path(source, target):
+def parse_years(text):
+    """
+    Parses a "FIRST-LAST" year range, where either end may be left
+    out, into a (first, last) tuple. Returns None for no range.
+    """
+    if text is None:
+        return None
+    first, _, last = text.partition("-")
+    return (int(first) if first else None, int(last) if last else None)
+
+
+def shortest_path(source, target, bidirectional=False, early_exit=False,
+                  stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    With bidirectional=True the search grows from both ends
+    and meets in the middle (see bidirectional_path). With
+    early_exit=True the target is detected as soon as it is
+    generated (see early_exit_path).
+
+    stats, a util.SearchStats, collects counters and timings
+    for the search when given.
+    """
+    # People in different components are never connected
+    if component_of(source) != component_of(target):
+        if stats is not None:
+            stats.finish()
+        return None
+
+    if bidirectional:
+        search = bidirectional_path
+    elif early_exit:
+        search = early_exit_path
+    else:
+        search = breadth_first_path
+
+    if graph is not None:
+        # Search the compact graph's ints and only convert the result
+        source, target = graph.person_index(source), graph.person_index(target)
+        neighbors = graph.neighbors
+    else:
+        neighbors = neighbors_for_person
+    if neighbor_cache is not None:
+        neighbors = neighbor_cache
+
+    if stats is not None:
+        neighbors = stats.wrap_neighbors(neighbors)
+    path = search(source, target, neighbors, stats)
+    if stats is not None:
+        stats.finish()
+
+    if graph is not None:
+        return graph.path_ids(path)
+    return path
+
+
+def breadth_first_path(source, target, neighbors, stats=None):
+    """
+    Breadth-first search over (movie_id, person_id) states, testing
+    for the target when a node is removed from the frontier.
+
+    neighbors(person_id) returns the (movie_id, person_id) pairs
+    reachable from a person, as in neighbors_for_person.
     """
     start = Node((None, source), None, None)
     explored = set()
     
-    frontier = QueueFrontier()
+    frontier = QueueFrontier(stats)
     frontier.add(start)
+    if stats is not None:
+        stats.track(explored)
+    # The last node of the layer being expanded and the last node
+    # added so far, which ends the next layer
+    layer_end = start
+    last_added = None
     
     while not frontier.empty():
         node = frontier.remove()
         
         if node.state[1] == target:
-            path = []
-            while node.parent is not None:
-                path.append(node.state)
-                node = node.parent
-            path.reverse()
-            return path
+            return node_path(node)
         
         explored.add(node.state)
         
-        neighbors = neighbors_for_person(node.state[1])
-        
-        for neighbor in neighbors:
+        for neighbor in neighbors(node.state[1]):
             # neighbors.add((movie_id, person_id))
             if neighbor not in explored and not frontier.contains_state(neighbor):
                 childNode = Node(neighbor, node, None)
                 frontier.add(childNode)
+                last_added = childNode
+
+        if stats is not None and node is layer_end and last_added is not None:
+            stats.end_layer()
+            layer_end = last_added
     return None
     # TODO
     # raise NotImplementedError
 
 
-def person_id_for_name(name):
+def early_exit_path(source, target, neighbors, stats=None):
+    """
+    Breadth-first search that checks for the target when neighbors
+    are generated rather than when they are removed from the frontier.
+
+    Each person is enqueued at most once, however many movies they
+    share with the people already reached. Since BFS reaches every
+    person first through one of their shortest paths, the returned
+    path is still a shortest one.
+    """
+    if source == target:
+        return []
+
+    start = Node((None, source), None, None)
+    reached = {source}
+
+    frontier = QueueFrontier(stats)
+    frontier.add(start)
+    if stats is not None:
+        stats.track(reached)
+    # The last node of the layer being expanded and the last node
+    # added so far, which ends the next layer
+    layer_end = start
+    last_added = None
+
+    while not frontier.empty():
+        node = frontier.remove()
+        for movie_id, person_id in neighbors(node.state[1]):
+            if person_id in reached:
+                continue
+            child = Node((movie_id, person_id), node, None)
+            if person_id == target:
+                return node_path(child)
+            reached.add(person_id)
+            frontier.add(child)
+            last_added = child
+
+        if stats is not None and node is layer_end and last_added is not None:
+            stats.end_layer()
+            layer_end = last_added
+    return None
+
+
+def node_path(node):
+    """
+    Returns the (movie_id, person_id) states from the search root
+    to node, not including the root itself.
+    """
+    path = []
+    while node.parent is not None:
+        path.append(node.state)
+        node = node.parent
+    path.reverse()
+    return path
+
+
+def bidirectional_path(source, target, neighbors, stats=None):
+    """
+    Breadth-first search from source and target at the same time.
+
+    Each round expands one whole layer of whichever side has the
+    smaller frontier, and stops at the first layer where the two
+    searches touch. Returns the same path format as shortest_path.
+    """
+    if source == target:
+        return []
+
+    # Maps each reached person to (movie_id, person_id) one step
+    # closer to the root of that side, or None for the root itself
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+    if stats is not None:
+        stats.track(forward, backward)
+
+    while forward_layer and backward_layer:
+        if len(forward_layer) <= len(backward_layer):
+            forward_layer, meetings = expand_layer(
+                forward_layer, forward, backward, neighbors)
+        else:
+            backward_layer, meetings = expand_layer(
+                backward_layer, backward, forward, neighbors)
+        if stats is not None:
+            stats.frontier_size(len(forward_layer) + len(backward_layer))
+            stats.end_layer()
+
+        if meetings:
+            # Meeting points found in the same layer can still sit at
+            # different depths on the other side, so keep the shortest
+            best = None
+            for person_id in meetings:
+                path = (walk_parents(forward, person_id)[::-1]
+                        + walk_parents(backward, person_id, toward_root=True))
+                if best is None or len(path) < len(best):
+                    best = path
+            return best
+    return None
+
+
+def expand_layer(layer, parents, other, neighbors):
+    """
+    Expands every person in layer, recording parents for newly
+    reached people. Returns the next layer and the people in it
+    that the other side of the search has already reached.
+    """
+    next_layer = []
+    meetings = []
+    for person_id in layer:
+        for movie_id, neighbor in neighbors(person_id):
+            if neighbor in parents:
+                continue
+            parents[neighbor] = (movie_id, person_id)
+            next_layer.append(neighbor)
+            if neighbor in other:
+                meetings.append(neighbor)
+    return next_layer, meetings
+
+
+def walk_parents(parents, person_id, toward_root=False):
+    """
+    Follows parents from person_id back to the root of the search.
+
+    By default returns the (movie_id, person_id) steps that lead from
+    the root to person_id, listed from person_id backwards. With
+    toward_root=True, returns the steps that lead from person_id to
+    the root instead, in walking order.
+    """
+    steps = []
+    while parents[person_id] is not None:
+        movie_id, parent = parents[person_id]
+        steps.append((movie_id, parent if toward_root else person_id))
+        person_id = parent
+    return steps
+
+
+def cache_neighbors(budget=1_000_000, precompute=False):
+    """
+    Makes shortest_path look neighbors up in an LRU cache keyed by
+    person, holding at most budget (movie_id, person_id) pairs in
+    total, or any number if budget is None. Returns the cache, whose
+    hits, misses and evictions can be read off it.
+
+    With precompute=True the cache is filled for every person up
+    front, until the budget runs out. A budget of 0 turns caching off.
+    Loading data again also turns it off.
+    """
+    global neighbor_cache
+    if budget == 0:
+        neighbor_cache = None
+        return None
+
+    if graph is not None:
+        neighbor_cache = NeighborCache(graph.neighbors, budget)
+        everyone = range(len(graph.person_ids))
+    else:
+        neighbor_cache = NeighborCache(neighbors_for_person, budget)
+        everyone = people
+    if precompute:
+        neighbor_cache.warm(everyone)
+    return neighbor_cache
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connects the source to the target, one at a time, so callers can
+    stop early, e.g. with itertools.islice for the first k. Yields
+    nothing if they are not connected.
+    """
+    space = search_space(source, target)
+    if space is None:
+        return
+    source, target, neighbors, to_ids = space
+    predecessors = shortest_path_dag(source, target, neighbors)
+    if predecessors is None:
+        return
+
+    def paths_to(person):
+        if person == source:
+            yield []
+            return
+        for movie, parent in predecessors[person]:
+            for path in paths_to(parent):
+                path.append((movie, person))
+                yield path
+
+    for path in paths_to(target):
+        yield to_ids(path)
+
+
+def count_shortest_paths(source, target):
+    """
+    Returns how many shortest paths connect the source to the target,
+    counting paths through different movies separately, without
+    listing them. Returns 0 if they are not connected.
+    """
+    space = search_space(source, target)
+    if space is None:
+        return 0
+    source, target, neighbors, _ = space
+    predecessors = shortest_path_dag(source, target, neighbors)
+    if predecessors is None:
+        return 0
+
+    counts = {source: 1}
+
+    def count(person):
+        if person not in counts:
+            counts[person] = sum(count(parent)
+                                 for _, parent in predecessors[person])
+        return counts[person]
+
+    return count(target)
+
+
+def shortest_path_dag(source, target, neighbors):
+    """
+    Breadth-first search from source that finishes the layer in which
+    target is found. Returns a dict mapping each reached person to the
+    (movie, person) pairs one layer closer to the source that lead to
+    them, which is the DAG of all shortest paths to target, or None
+    if target is not reached.
+    """
+    depth = {source: 0}
+    predecessors = {source: []}
+    layer = [source]
+    while layer and target not in depth:
+        next_layer = []
+        for person in layer:
+            for movie, neighbor in neighbors(person):
+                if neighbor not in depth:
+                    depth[neighbor] = depth[person] + 1
+                    predecessors[neighbor] = [(movie, person)]
+                    next_layer.append(neighbor)
+                elif depth[neighbor] == depth[person] + 1:
+                    predecessors[neighbor].append((movie, person))
+        layer = next_layer
+    if target not in depth:
+        return None
+    return predecessors
+
+
+def search_space(source, target):
+    """
+    Returns the source, target and neighbor function to search with
+    for the loaded data model, and a function converting a path found
+    with them back to ids. Returns None if the two people are in
+    different components.
+    """
+    if component_of(source) != component_of(target):
+        return None
+    if graph is not None:
+        return (graph.person_index(source), graph.person_index(target),
+                neighbor_cache or graph.neighbors, graph.path_ids)
+    return (source, target, neighbor_cache or neighbors_for_person,
+            lambda path: path)
+
+
+def weighted_path(source, target, weight=None, edge_filter=None,
+                  heuristic=None, stats=None):
+    """
+    Returns the cheapest list of (movie_id, person_id) pairs that
+    connect the source to the target, or None if there is none.
+
+    weight(movie_id) is the non-negative cost of a step through a
+    movie, 1 for every movie if not given, so the default is the
+    plain shortest path. Movies for which edge_filter(movie_id) is
+    false are not used at all.
+
+    With no heuristic this is Dijkstra's algorithm. heuristic(person_id)
+    turns it into A*; it must never overestimate the remaining cost,
+    as with distances.landmark_heuristic.
+    """
+    if component_of(source) != component_of(target):
+        if stats is not None:
+            stats.finish()
+        return None
+
+    if graph is not None:
+        source, target = graph.person_index(source), graph.person_index(target)
+        neighbors = neighbor_cache or graph.neighbors
+        movie_id, person_id = graph.movie_ids.__getitem__, graph.person_ids.__getitem__
+    else:
+        neighbors = neighbor_cache or neighbors_for_person
+        movie_id = person_id = lambda key: key
+    if stats is not None:
+        neighbors = stats.wrap_neighbors(neighbors)
+
+    # Cost of each movie seen so far, or None if it is filtered out
+    costs = {}
+
+    def cost(movie):
+        if movie not in costs:
+            if edge_filter is not None and not edge_filter(movie_id(movie)):
+                costs[movie] = None
+            else:
+                costs[movie] = 1 if weight is None else weight(movie_id(movie))
+        return costs[movie]
+
+    def estimate(person):
+        return 0 if heuristic is None else heuristic(person_id(person))
+
+    best = {source: 0}
+    settled = set()
+    frontier = PriorityFrontier(stats)
+    frontier.add(Node((None, source), None, None), estimate(source))
+    if stats is not None:
+        stats.track(settled)
+
+    path = None
+    while not frontier.empty():
+        node = frontier.remove()
+        person = node.state[1]
+        if person in settled:
+            # A stale entry, superseded by a cheaper one
+            continue
+        if person == target:
+            path = node_path(node)
+            break
+        settled.add(person)
+
+        for movie, neighbor in neighbors(person):
+            if neighbor in settled:
+                continue
+            step = cost(movie)
+            if step is None:
+                continue
+            total = best[person] + step
+            if neighbor not in best or total < best[neighbor]:
+                best[neighbor] = total
+                frontier.add(Node((movie, neighbor), node, None),
+                             total + estimate(neighbor))
+
+    if stats is not None:
+        stats.finish()
+    if graph is not None:
+        return graph.path_ids(path)
+    return path
+
+
+def movie_year(movie_id):
+    """
+    Returns a movie's year as an int, or None if it has none.
+    """
+    if graph is not None:
+        year = graph.movie_years[graph.movie_index(movie_id)]
+    else:
+        year = movies[movie_id]["year"]
+    try:
+        return int(year)
+    except ValueError:
+        return None
+
+
+def cast_size(movie_id):
+    if graph is not None:
+        return len(graph.stars_of(graph.movie_index(movie_id)))
+    return len(movies[movie_id]["stars"])
+
+
+def released_between(first=None, last=None):
+    """
+    Returns an edge_filter for weighted_path that keeps movies
+    released from first to last, inclusive; either may be None.
+    """
+    def keep(movie_id):
+        year = movie_year(movie_id)
+        return (year is not None
+                and (first is None or year >= first)
+                and (last is None or year <= last))
+    return keep
+
+
+def prefer_recent(now=None, per_decade=0.5):
+    """
+    Returns a weight for weighted_path that charges 1 for a movie
+    from the year now (by default the current year), plus per_decade
+    for every ten years older.
+    """
+    if now is None:
+        now = date.today().year
+
+    def weight(movie_id):
+        year = movie_year(movie_id)
+        age = now - year if year is not None else 100
+        return 1 + per_decade * max(0, age) / 10
+    return weight
+
+
+def prefer_popular(scale=1.0):
+    """
+    Returns a weight for weighted_path that favors movies with many
+    stars in the data, charging 1 + scale / cast size.
+    """
+    def weight(movie_id):
+        return 1 + scale / max(1, cast_size(movie_id))
+    return weight
+
+
+def person_id_for_name(name, policy=None):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    By default an ambiguous name is resolved by asking on stdin.
+    Passing one of the DISAMBIGUATION policies picks a person
+    without prompting instead.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
         return None
+    elif len(person_ids) > 1 and policy is not None:
+        return disambiguate(person_ids, policy)
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
@@ -148,11 +770,85 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def most_movies(person_id):
+    person = people[person_id]
+    return (-len(person["movies"]), person_id)
+
+
+def earliest_birth(person_id):
+    # People with no birth year sort after everyone else
+    birth = people[person_id]["birth"]
+    return (0, int(birth), person_id) if birth else (1, 0, person_id)
+
+
+# Sort keys for choosing among people who share a name; the
+# person with the smallest key wins
+DISAMBIGUATION = {
+    "most-movies": most_movies,
+    "earliest-birth": earliest_birth,
+}
+
+
+def disambiguate(person_ids, policy):
+    """
+    Chooses one of person_ids without prompting. policy is a key of
+    DISAMBIGUATION, or "none" to return None for any ambiguity.
+    """
+    if policy == "none":
+        return None
+    return min(person_ids, key=DISAMBIGUATION[policy])
+
+
+def resolve(name, policy="none"):
+    """
+    Returns the person id for a name without prompting, or raises
+    LookupError if the name is unknown, or ambiguous and policy
+    is "none".
+    """
+    person_ids = names.get(name.lower(), set())
+    if len(person_ids) == 1:
+        return next(iter(person_ids))
+    if not person_ids:
+        raise LookupError(f"person not found: {name}")
+    if policy != "none":
+        return disambiguate(person_ids, policy)
+    raise LookupError(
+        f"ambiguous name: {name} ({', '.join(sorted(person_ids))})")
+
+
+def get_name_index():
+    """
+    Returns the NameIndex for the loaded names, building it once.
+    """
+    global name_index
+    if name_index is None:
+        name_index = NameIndex(names)
+    return name_index
+
+
+def complete_name(prefix, limit=10):
+    """
+    Returns up to limit lowercase names, as keys of names,
+    that start with prefix.
+    """
+    return get_name_index().complete(prefix, limit)
+
+
+def similar_names(name, limit=10):
+    """
+    Returns up to limit lowercase names, as keys of names,
+    that are spelled most like name.
+    """
+    return get_name_index().fuzzy(name, limit)
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
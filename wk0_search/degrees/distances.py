@@ -0,0 +1,259 @@
+"""
+Single-source shortest paths for degrees.py.
+
+A SourceTree is one breadth-first search from a source person, run to
+the end of the source's component, that keeps each person's parent,
+the movie linking them, and their distance. After that, the shortest
+path from the source to anyone is a walk up the tree, with no search.
+
+TreeCache keeps the most recently used trees in memory and saves the
+trees of hub actors to disk, so questions like "Kevin Bacon number"
+for everyone cost one search in total.
+"""
+
+import os
+import pickle
+from array import array
+from collections import OrderedDict, deque
+
+import degrees
+from graph import csv_signature
+
+TREE_DIRECTORY = ".degrees-trees"
+TREE_VERSION = 2
+
+
+class SourceTree():
+    def __init__(self, source, parent, movie, distance):
+        self.source = source
+        # Indexed by person: by person_id for the dict data model, by
+        # person int (with -1 for unreached) for the compact graph
+        self.parent = parent
+        self.movie = movie
+        self.distance = distance
+
+    @classmethod
+    def build(cls, source):
+        """
+        Runs a breadth-first search from source over the loaded data.
+        """
+        graph = degrees.graph
+        if graph is None:
+            return cls.build_dict(source)
+
+        n = len(graph.person_ids)
+        parent = array("i", [-1]) * n
+        movie = array("i", [-1]) * n
+        distance = array("i", [-1]) * n
+
+        start = graph.person_index(source)
+        distance[start] = 0
+        queue = deque([start])
+        while queue:
+            p = queue.popleft()
+            for m, q in graph.neighbors(p):
+                if distance[q] == -1:
+                    parent[q] = p
+                    movie[q] = m
+                    distance[q] = distance[p] + 1
+                    queue.append(q)
+        return cls(source, parent, movie, distance)
+
+    @classmethod
+    def build_dict(cls, source):
+        """
+        Runs a breadth-first search from source over the dict data model.
+        """
+        parent, movie, distance = {}, {}, {source: 0}
+        queue = deque([source])
+        while queue:
+            person_id = queue.popleft()
+            for movie_id, neighbor in degrees.neighbors_for_person(person_id):
+                if neighbor not in distance:
+                    parent[neighbor] = person_id
+                    movie[neighbor] = movie_id
+                    distance[neighbor] = distance[person_id] + 1
+                    queue.append(neighbor)
+        return cls(source, parent, movie, distance)
+
+    def key(self, person_id):
+        """
+        Returns the index used for person_id in this tree's tables.
+        """
+        if isinstance(self.distance, array):
+            return degrees.graph.person_index(person_id)
+        return person_id
+
+    def distance_to(self, person_id):
+        """
+        Returns the degrees of separation between the source and
+        person_id, or None if they are not connected.
+        """
+        distance = self.distance
+        key = self.key(person_id)
+        if isinstance(distance, array):
+            return distance[key] if distance[key] != -1 else None
+        return distance.get(key)
+
+    def path_to(self, person_id):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs from
+        the source to person_id, or None if they are not connected.
+        """
+        if self.distance_to(person_id) is None:
+            return None
+        key = self.key(person_id)
+        path = []
+        for _ in range(self.distance[key]):
+            path.append((self.movie[key], key))
+            key = self.parent[key]
+        path.reverse()
+        if isinstance(self.distance, array):
+            return degrees.graph.path_ids(path)
+        return path
+
+    def reached(self):
+        """
+        Returns how many people are in the source's component.
+        """
+        if isinstance(self.distance, array):
+            return sum(1 for d in self.distance if d != -1)
+        return len(self.distance)
+
+
+class TreeCache():
+    """
+    Least-recently-used cache of SourceTrees.
+
+    When directory is given, trees for sources who starred in at
+    least hub_movies movies are also saved under it and reused by
+    later runs on the same data.
+    """
+
+    def __init__(self, max_trees=16, directory=None, hub_movies=20):
+        self.max_trees = max_trees
+        self.directory = directory
+        self.hub_movies = hub_movies
+        self.trees = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source):
+        """
+        Returns the SourceTree for source, building it if needed.
+        """
+        tree = self.trees.get(source)
+        if tree is not None:
+            self.trees.move_to_end(source)
+            self.hits += 1
+            return tree
+
+        self.misses += 1
+        tree = self.load(source)
+        if tree is None:
+            tree = SourceTree.build(source)
+            if self.is_hub(source):
+                self.save(tree)
+        self.trees[source] = tree
+        if len(self.trees) > self.max_trees:
+            self.trees.popitem(last=False)
+        return tree
+
+    def shortest_path(self, source, target):
+        """
+        Returns the same result as degrees.shortest_path, answered
+        from the source's tree.
+        """
+        return self.get(source).path_to(target)
+
+    def is_hub(self, source):
+        return (self.directory is not None
+                and len(degrees.people[source]["movies"]) >= self.hub_movies)
+
+    def path(self, source):
+        """
+        Returns the file a tree for source is saved in. The file name
+        notes the data model, since the two store trees differently,
+        and any movie filter the compact graph was loaded with, since
+        filtered graphs number movies differently and drop some.
+        """
+        model = "compact" if degrees.graph is not None else "dict"
+        movie_filter = self.movie_filter()
+        if movie_filter is not None:
+            model = f"{model}-{movie_filter}"
+        return os.path.join(self.directory, TREE_DIRECTORY,
+                            f"{source}.{model}.tree")
+
+    def movie_filter(self):
+        graph = degrees.graph
+        return graph.movie_filter if graph is not None else None
+
+    def save(self, tree):
+        path = self.path(tree.source)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                pickle.dump((TREE_VERSION, csv_signature(self.directory),
+                             self.movie_filter(), tree),
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)
+        except OSError:
+            # Saving is only an optimization; a read-only directory is fine
+            pass
+
+    def load(self, source):
+        """
+        Returns the saved tree for source, or None if there isn't one
+        or it was built from different data or filters.
+        """
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(source), "rb") as f:
+                version, signature, movie_filter, tree = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if (version != TREE_VERSION
+                or signature != csv_signature(self.directory)
+                or movie_filter != self.movie_filter()):
+            return None
+        return tree
+
+
+def hub_people(n):
+    """
+    Returns the n people who starred in the most movies, which make
+    good landmarks for landmark_heuristic.
+    """
+    graph = degrees.graph
+    if graph is not None:
+        offsets = graph.person_offsets
+        top = sorted(range(len(graph.person_ids)),
+                     key=lambda p: offsets[p] - offsets[p + 1])[:n]
+        return [graph.person_ids[p] for p in top]
+    return sorted(degrees.people,
+                  key=lambda person_id: -len(degrees.people[person_id]["movies"]))[:n]
+
+
+def landmark_heuristic(target, trees, min_weight=1):
+    """
+    Returns an A* heuristic for degrees.weighted_path towards target,
+    from SourceTrees of a few landmark people.
+
+    By the triangle inequality, nobody is closer to target than the
+    difference of their distances to any landmark, so this never
+    overestimates as long as every step costs at least min_weight.
+    Filtering out movies only makes paths longer, so it stays valid.
+    """
+    to_target = [(tree, tree.distance_to(target)) for tree in trees]
+    to_target = [(tree, d) for tree, d in to_target if d is not None]
+
+    def estimate(person_id):
+        bound = 0
+        for tree, d in to_target:
+            distance = tree.distance_to(person_id)
+            if distance is not None:
+                bound = max(bound, abs(d - distance))
+        return bound * min_weight
+    return estimate
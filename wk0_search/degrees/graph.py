@@ -0,0 +1,702 @@
+"""
+Compact, integer-indexed form of the IMDB data used by degrees.py.
+
+People and movies are interned to dense ints in sorted id order, and
+who-starred-in-what is stored as two CSR adjacency structures: for
+person p, the movies are indices[offsets[p]:offsets[p + 1]], and the
+same for the stars of a movie. Everything lives in flat arrays instead
+of a dict and a set per entry.
+
+A graph can be saved as a binary snapshot and memory-mapped back in,
+which skips parsing the CSV files on later runs.
+"""
+
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then not reported
+    resource = None
+
+SNAPSHOT_MAGIC = b"DEGSNAP\0"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_NAME = ".degrees.snapshot"
+CSV_FILES = ("people.csv", "movies.csv", "stars.csv")
+
+# Attributes stored in a snapshot, by kind
+INT_ARRAYS = ("person_offsets", "person_movies",
+              "movie_offsets", "movie_people", "name_order",
+              "component", "component_sizes")
+STRING_TABLES = ("person_ids", "person_names", "person_births",
+                 "movie_ids", "movie_titles", "movie_years")
+
+
+class CompactGraph():
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies,
+                 movie_offsets, movie_people, name_order,
+                 component=None, component_sizes=None):
+        # Sorted id strings; a person's or movie's int is its position here
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+
+        # CSR adjacency: person -> movies and movie -> people
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+
+        # Person ints sorted by lowercase name, for name lookups
+        self.name_order = name_order
+
+        # Connected component label of each person, and component sizes
+        if component is None:
+            component, component_sizes = label_components(
+                len(person_ids), movie_offsets, movie_people)
+        self.component = component
+        self.component_sizes = component_sizes
+
+        # LoadStats when built from CSV files, None when memory-mapped
+        self.load_stats = None
+
+        # filter_key of the movie filters from_csv applied, None if the
+        # graph holds every movie
+        self.movie_filter = None
+
+        # Dict-like views matching the people/movies/names dicts
+        self.people = PeopleView(self)
+        self.movies = MoviesView(self)
+        self.names = NamesView(self)
+
+    @classmethod
+    def from_csv(cls, directory, years=None, movie_ids=None):
+        """
+        Builds a compact graph from the people, movies and stars
+        CSV files in directory.
+
+        years is an optional (first, last) range, either end of which
+        may be None, and movie_ids an optional collection of movie ids;
+        movies outside them are left out, along with their stars.
+
+        stars.csv is streamed one row at a time and no strings or dicts
+        are kept per star row: each kept row costs 8 bytes in two int
+        arrays, plus about three times that while build_csr turns them
+        into the adjacency arrays. Memory still grows linearly with
+        the kept rows, and people.csv and movies.csv are read in full
+        and sorted. The graph's load_stats records loader throughput
+        and peak memory.
+        """
+        stats = LoadStats()
+        movie_filter = filter_key(years, movie_ids)
+
+        movies = sorted(
+            row for row in read_columns(f"{directory}/movies.csv",
+                                        ("id", "title", "year"))
+            if keep_movie(row, years, movie_ids)
+        )
+        people = sorted(read_columns(f"{directory}/people.csv",
+                                     ("id", "name", "birth")))
+        stats.people, stats.movies = len(people), len(movies)
+
+        person_ids = [row[0] for row in people]
+        movie_ids = [row[0] for row in movies]
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+        # One int per kept row and column, rather than a tuple of strings
+        star_people, star_movies = array("i"), array("i")
+        rows = read_columns(f"{directory}/stars.csv", ("person_id", "movie_id"))
+        for person_id, movie_id in rows:
+            stats.rows += 1
+            p = person_index.get(person_id)
+            m = movie_index.get(movie_id)
+            if p is not None and m is not None:
+                star_people.append(p)
+                star_movies.append(m)
+        stats.kept = len(star_people)
+        del person_index, movie_index
+
+        n_people, n_movies = len(person_ids), len(movie_ids)
+        person_offsets, person_movies = build_csr(
+            n_people, star_people, star_movies)
+        movie_offsets, movie_people = build_csr(
+            n_movies, star_movies, star_people)
+        del star_people, star_movies
+
+        names = [row[1] for row in people]
+        name_order = array("i", sorted(range(n_people),
+                                       key=lambda p: names[p].lower()))
+
+        graph = cls(
+            person_ids, names, [row[2] for row in people],
+            movie_ids, [row[1] for row in movies], [row[2] for row in movies],
+            person_offsets, person_movies,
+            movie_offsets, movie_people, name_order
+        )
+        stats.finish()
+        graph.load_stats = stats
+        graph.movie_filter = movie_filter
+        return graph
+
+    @classmethod
+    def from_directory(cls, directory):
+        """
+        Returns the graph for directory, memory-mapped from its
+        snapshot when that is current, or else built from the CSV
+        files and saved as a new snapshot.
+        """
+        path = os.path.join(directory, SNAPSHOT_NAME)
+        signature = csv_signature(directory)
+        graph = cls.load(path, signature)
+        if graph is None:
+            graph = cls.from_csv(directory)
+            try:
+                graph.save(path, signature)
+            except OSError:
+                # A read-only data directory just means no snapshot
+                pass
+        return graph
+
+    def save(self, path, signature):
+        """
+        Writes the graph to a binary snapshot at path, tagged with
+        the signature of the CSV files it was built from.
+        """
+        sections = []
+        for name in INT_ARRAYS:
+            sections.append((name, "i", getattr(self, name)))
+        for name in STRING_TABLES:
+            offsets, data = encode_strings(getattr(self, name))
+            sections.append((f"{name}.offsets", "q", offsets))
+            sections.append((f"{name}.data", "B", data))
+
+        # Lay sections out after the header, each aligned to 8 bytes
+        layout = {}
+        position = 0
+        for name, typecode, values in sections:
+            size = memoryview(values).nbytes
+            layout[name] = [position, size, typecode]
+            position = align(position + size)
+        header = json.dumps({
+            "version": SNAPSHOT_VERSION,
+            "byteorder": sys.byteorder,
+            "signature": signature,
+            "sections": layout
+        }).encode()
+        start = align(len(SNAPSHOT_MAGIC) + 4 + len(header))
+
+        # Write to a temporary file first so a crash never leaves
+        # a half-written snapshot behind
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for name, typecode, values in sections:
+                f.seek(start + layout[name][0])
+                f.write(memoryview(values).cast("B"))
+            f.truncate(start + position)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path, signature=None):
+        """
+        Memory-maps the snapshot at path. Returns None if there is no
+        usable snapshot: it is missing, truncated or malformed, from
+        another version or byte order, or was built from CSV files
+        that have since changed.
+        """
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        header = read_header(buffer)
+        if (header is None
+                or header.get("version") != SNAPSHOT_VERSION
+                or header.get("byteorder") != sys.byteorder
+                or (signature is not None
+                    and header.get("signature") != signature)
+                or not valid_layout(header, len(buffer))):
+            buffer.close()
+            return None
+
+        view = memoryview(buffer)
+        start = align(len(SNAPSHOT_MAGIC) + 4 + header["length"])
+        sections = {}
+        for name, (offset, size, typecode) in header["sections"].items():
+            section = view[start + offset:start + offset + size]
+            sections[name] = section.cast(typecode) if typecode != "B" else section
+        if not consistent(sections):
+            for section in sections.values():
+                section.release()
+            view.release()
+            buffer.close()
+            return None
+
+        fields = {name: sections[name] for name in INT_ARRAYS}
+        for name in STRING_TABLES:
+            fields[name] = StringTable(sections[f"{name}.offsets"],
+                                       sections[f"{name}.data"])
+        graph = cls(**fields)
+        # Keep the mapping open for as long as the graph uses it
+        graph.buffer = buffer
+        return graph
+
+    def person_index(self, person_id):
+        """
+        Returns the int for a person id, or raises KeyError.
+        """
+        return find(self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the int for a movie id, or raises KeyError.
+        """
+        return find(self.movie_ids, movie_id)
+
+    def movies_of(self, p):
+        """
+        Returns the movie ints person p starred in.
+        """
+        return self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+
+    def stars_of(self, m):
+        """
+        Returns the person ints who starred in movie m.
+        """
+        return self.movie_people[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+
+    def neighbors(self, p):
+        """
+        Yields (movie, person) int pairs for people who starred
+        with person p.
+        """
+        person_offsets, movie_offsets = self.person_offsets, self.movie_offsets
+        movie_people = self.movie_people
+        for i in range(person_offsets[p], person_offsets[p + 1]):
+            m = self.person_movies[i]
+            for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                yield m, movie_people[j]
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people who starred
+        with a given person, like degrees.neighbors_for_person.
+        """
+        return {
+            (self.movie_ids[m], self.person_ids[p])
+            for m, p in self.neighbors(self.person_index(person_id))
+        }
+
+    def path_ids(self, path):
+        """
+        Converts a path of (movie, person) ints back to id strings.
+        """
+        if path is None:
+            return None
+        return [(self.movie_ids[m], self.person_ids[p]) for m, p in path]
+
+
+def csv_signature(directory):
+    """
+    Returns the size and modification time of each CSV file in
+    directory, used to tell whether a snapshot is still current.
+    """
+    signature = []
+    for name in CSV_FILES:
+        stat = os.stat(os.path.join(directory, name))
+        signature.append([name, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def read_header(buffer):
+    """
+    Returns the JSON header of a snapshot, or None if buffer
+    does not hold one.
+    """
+    prefix = len(SNAPSHOT_MAGIC)
+    if len(buffer) < prefix + 4 or buffer[:prefix] != SNAPSHOT_MAGIC:
+        return None
+    (length,) = struct.unpack("<I", buffer[prefix:prefix + 4])
+    try:
+        header = json.loads(buffer[prefix + 4:prefix + 4 + length])
+    except ValueError:
+        return None
+    if not isinstance(header, dict):
+        return None
+    header["length"] = length
+    return header
+
+
+def valid_layout(header, buffer_size):
+    """
+    Returns True if the header lists every section a graph needs, each
+    lying within a buffer of buffer_size bytes and holding a whole
+    number of items.
+    """
+    start = align(len(SNAPSHOT_MAGIC) + 4 + header["length"])
+    needed = set(INT_ARRAYS)
+    for name in STRING_TABLES:
+        needed.update((f"{name}.offsets", f"{name}.data"))
+    try:
+        sections = header["sections"]
+        if not needed <= sections.keys():
+            return False
+        for offset, size, typecode in sections.values():
+            if (typecode not in ("i", "q", "B")
+                    or not isinstance(offset, int) or not isinstance(size, int)
+                    or offset < 0 or size < 0
+                    or start + offset + size > buffer_size
+                    or size % struct.calcsize(typecode)):
+                return False
+    except (TypeError, AttributeError, ValueError):
+        return False
+    return True
+
+
+def consistent(sections):
+    """
+    Returns True if snapshot sections agree with each other: every
+    person and movie table has one entry per person or movie, and
+    the offsets of each CSR array and string table span its data.
+    Only lengths and end points are checked, plus the sum of the
+    component sizes, so this is cheap next to rebuilding the graph.
+    """
+    def table_length(name):
+        offsets, data = sections[f"{name}.offsets"], sections[f"{name}.data"]
+        if len(offsets) < 1 or offsets[0] != 0 or offsets[-1] != len(data):
+            return None
+        return len(offsets) - 1
+
+    n_people = table_length("person_ids")
+    n_movies = table_length("movie_ids")
+    if n_people is None or n_movies is None:
+        return False
+    if any(table_length(name) != n_people
+           for name in ("person_names", "person_births")):
+        return False
+    if any(table_length(name) != n_movies
+           for name in ("movie_titles", "movie_years")):
+        return False
+
+    for offsets, n, targets in (("person_offsets", n_people, "person_movies"),
+                                ("movie_offsets", n_movies, "movie_people")):
+        offsets = sections[offsets]
+        if (len(offsets) != n + 1 or offsets[0] != 0
+                or offsets[n] != len(sections[targets])):
+            return False
+    return (len(sections["person_movies"]) == len(sections["movie_people"])
+            and len(sections["name_order"]) == n_people
+            and len(sections["component"]) == n_people
+            and sum(sections["component_sizes"]) == n_people)
+
+
+def align(position):
+    """
+    Rounds position up to a multiple of 8 bytes.
+    """
+    return (position + 7) & ~7
+
+
+def encode_strings(strings):
+    """
+    Packs strings into one UTF-8 blob plus the offsets of each
+    string within it, the layout StringTable reads back.
+    """
+    offsets = array("q", [0])
+    data = bytearray()
+    for string in strings:
+        data += string.encode("utf-8")
+        offsets.append(len(data))
+    return offsets, data
+
+
+class StringTable(Sequence):
+    """
+    Read-only sequence of strings decoded on demand from a UTF-8
+    blob, so a memory-mapped snapshot never has to decode them all.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def label_components(n_people, movie_offsets, movie_people):
+    """
+    Labels connected components with union-find over each movie's
+    cast. Returns each person's label, numbered from 0 in order of
+    first appearance, and the number of people with each label.
+    """
+    parent = array("i", range(n_people))
+
+    def find(p):
+        while parent[p] != p:
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
+
+    for m in range(len(movie_offsets) - 1):
+        start, end = movie_offsets[m], movie_offsets[m + 1]
+        if end - start < 2:
+            continue
+        root = find(movie_people[start])
+        for i in range(start + 1, end):
+            other = find(movie_people[i])
+            if other != root:
+                parent[other] = root
+
+    component = array("i", [-1]) * n_people
+    sizes = array("i")
+    for p in range(n_people):
+        root = find(p)
+        if component[root] == -1:
+            component[root] = len(sizes)
+            sizes.append(0)
+        component[p] = component[root]
+        sizes[component[p]] += 1
+    return component, sizes
+
+
+def build_csr(n_rows, rows, cols):
+    """
+    Builds CSR offsets and indices from parallel arrays of row and
+    column ints, with each row's columns sorted and duplicates dropped.
+    """
+    # Counting sort: size each row, then drop the columns into place
+    offsets = array("i", bytes(4 * (n_rows + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for row in range(n_rows):
+        offsets[row + 1] += offsets[row]
+    position = offsets[:-1]
+    indices = array("i", bytes(4 * len(cols)))
+    for row, col in zip(rows, cols):
+        indices[position[row]] = col
+        position[row] += 1
+
+    # Sort each row in place and squeeze out repeated columns
+    end = 0
+    for row in range(n_rows):
+        start, stop = offsets[row], offsets[row + 1]
+        offsets[row] = end
+        previous = -1
+        for col in sorted(indices[start:stop]):
+            if col != previous:
+                indices[end] = col
+                end += 1
+                previous = col
+    offsets[n_rows] = end
+    del indices[end:]
+    return offsets, indices
+
+
+def read_columns(path, columns):
+    """
+    Yields a tuple of the named columns for each row of a CSV file,
+    without building a dict per row.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        positions = [header.index(column) for column in columns]
+        for row in reader:
+            yield tuple(row[i] for i in positions)
+
+
+def keep_movie(row, years, movie_ids):
+    """
+    Returns whether a (id, title, year) movie row passes the filters.
+    """
+    if movie_ids is not None and row[0] not in movie_ids:
+        return False
+    if years is not None:
+        try:
+            year = int(row[2])
+        except ValueError:
+            return False
+        first, last = years
+        if (first is not None and year < first
+                or last is not None and year > last):
+            return False
+    return True
+
+
+def filter_key(years, movie_ids):
+    """
+    Returns a short string naming the movie filters passed to from_csv,
+    or None when there are none. Graphs built with different filters
+    number their movies differently, so anything saved from one graph
+    must only be reused with a graph that has the same key.
+    """
+    if years is None and movie_ids is None:
+        return None
+    described = json.dumps([
+        list(years) if years is not None else None,
+        sorted(movie_ids) if movie_ids is not None else None,
+    ])
+    return hashlib.sha1(described.encode()).hexdigest()[:16]
+
+
+class LoadStats():
+    """
+    Counts and timings from building a CompactGraph from CSV files.
+    """
+
+    def __init__(self):
+        self.people = 0
+        self.movies = 0
+        self.rows = 0
+        self.kept = 0
+        self.seconds = 0.0
+        self.peak_rss = None
+        self.started = perf_counter()
+
+    def finish(self):
+        self.seconds = perf_counter() - self.started
+        self.peak_rss = peak_rss()
+
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        report = (f"Loaded {self.people} people, {self.movies} movies and "
+                  f"{self.kept} of {self.rows} star rows in "
+                  f"{self.seconds:.2f}s ({self.rows_per_second():,.0f} rows/s)")
+        if self.peak_rss is not None:
+            report += f", peak RSS {self.peak_rss / 2 ** 20:.1f} MiB"
+        return report + "."
+
+
+def peak_rss():
+    """
+    Returns this process's peak resident set size in bytes,
+    or None where that can't be measured.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def find(ids, id):
+    """
+    Returns the position of id in the sorted sequence ids.
+    """
+    i = bisect_left(ids, id)
+    if i == len(ids) or ids[i] != id:
+        raise KeyError(id)
+    return i
+
+
+class PeopleView(Mapping):
+    """
+    Read-only view of a CompactGraph shaped like degrees.people.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        p = graph.person_index(person_id)
+        return {
+            "name": graph.person_names[p],
+            "birth": graph.person_births[p],
+            "movies": {graph.movie_ids[m] for m in graph.movies_of(p)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Read-only view of a CompactGraph shaped like degrees.movies.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        m = graph.movie_index(movie_id)
+        return {
+            "title": graph.movie_titles[m],
+            "year": graph.movie_years[m],
+            "stars": {graph.person_ids[p] for p in graph.stars_of(m)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class NamesView(Mapping):
+    """
+    Read-only view of a CompactGraph shaped like degrees.names,
+    mapping lowercase names to sets of person ids.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def key(self, p):
+        return self.graph.person_names[p].lower()
+
+    def __getitem__(self, name):
+        graph = self.graph
+        order = graph.name_order
+        i = bisect_left(order, name, key=self.key)
+        person_ids = set()
+        while i < len(order) and self.key(order[i]) == name:
+            person_ids.add(graph.person_ids[order[i]])
+            i += 1
+        if not person_ids:
+            raise KeyError(name)
+        return person_ids
+
+    def __iter__(self):
+        previous = None
+        for p in self.graph.name_order:
+            name = self.key(p)
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -0,0 +1,79 @@
+"""
+Prefix and trigram index over the names in degrees.names.
+
+Names are kept in the same lowercase form as the keys of
+degrees.names, so results can be looked up there for person ids.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+
+class NameIndex():
+    def __init__(self, names):
+        # Sorted distinct lowercase names; a name's int is its position
+        self.names = sorted(set(names))
+
+        # Maps each trigram to the ints of the names containing it, and
+        # holds how many distinct trigrams each name has
+        self.trigrams = {}
+        self.sizes = array("H")
+        for i, name in enumerate(self.names):
+            name_trigrams = trigrams(name)
+            self.sizes.append(min(len(name_trigrams), 0xFFFF))
+            for trigram in name_trigrams:
+                postings = self.trigrams.get(trigram)
+                if postings is None:
+                    postings = self.trigrams[trigram] = array("i")
+                postings.append(i)
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns up to limit names starting with prefix, in order.
+        """
+        prefix = prefix.lower()
+        i = bisect_left(self.names, prefix)
+        matches = []
+        while (i < len(self.names) and len(matches) < limit
+                and self.names[i].startswith(prefix)):
+            matches.append(self.names[i])
+            i += 1
+        return matches
+
+    def fuzzy(self, query, limit=10, threshold=0.3):
+        """
+        Returns up to limit names that share the most trigrams with
+        query, best first, skipping any whose Dice similarity is below
+        threshold. Catches typos and missing or swapped letters.
+        """
+        wanted = trigrams(query.lower())
+        if not wanted:
+            return []
+
+        shared = Counter()
+        for trigram in wanted:
+            shared.update(self.trigrams.get(trigram, ()))
+
+        # A name has at least as many trigrams as it shares, so one
+        # sharing fewer than this can't reach threshold
+        fewest = threshold * len(wanted) / (2 - threshold)
+        sizes = self.sizes
+        scored = []
+        for i, count in shared.items():
+            if count < fewest:
+                continue
+            score = 2 * count / (len(wanted) + sizes[i])
+            if score >= threshold:
+                scored.append((-score, self.names[i]))
+        scored.sort()
+        return [name for _, name in scored[:limit]]
+
+
+def trigrams(name):
+    """
+    Returns the set of three-letter substrings of name, padded so
+    that the start and end of the name count as well.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
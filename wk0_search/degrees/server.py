@@ -0,0 +1,316 @@
+"""
+Long-running degrees query server that keeps the graph loaded.
+
+Loads the data once, then answers HTTP GET requests on a TCP port or a
+Unix socket, several at a time:
+
+    python server.py large --snapshot --port 8050
+
+    GET /path?source=Kevin+Bacon&target=Tom+Hanks[&mode=early-exit]
+    GET /names?q=kevin+ba[&fuzzy=1][&limit=10]
+    GET /metrics
+
+Every response is JSON. Searches run on a thread pool so the event loop
+keeps accepting connections, and each one gives up once it has run for
+--timeout seconds, not counting time spent waiting for a free thread.
+query() is a small client for the same API, and run_in_thread() starts
+a server in the background for tests.
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import socket
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import degrees
+from util import SearchStats, percentiles
+
+DEFAULT_PORT = 8050
+
+# Keyword arguments for degrees.shortest_path per mode
+MODES = {
+    "bfs": {},
+    "early-exit": {"early_exit": True},
+    "bidirectional": {"bidirectional": True},
+}
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+           500: "Internal Server Error", 504: "Gateway Timeout"}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Deadline(SearchStats):
+    """
+    SearchStats that stops a search once it runs past a deadline,
+    checked each time a node is expanded.
+    """
+
+    def __init__(self, seconds):
+        super().__init__()
+        self.deadline = perf_counter() + seconds
+
+    def expanded(self, state):
+        super().expanded(state)
+        if perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+
+class Metrics():
+    """
+    Request counts and recent latencies for the /metrics endpoint.
+    """
+
+    def __init__(self, window=1000):
+        self.started = perf_counter()
+        self.requests = Counter()
+        self.statuses = Counter()
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.expanded = deque(maxlen=window)
+        self.queue_waits = deque(maxlen=window)
+
+    def as_dict(self):
+        uptime = perf_counter() - self.started
+        total = sum(self.requests.values())
+        return {
+            "uptime": uptime,
+            "requests": dict(self.requests),
+            "statuses": {str(status): n for status, n in self.statuses.items()},
+            "in_flight": self.in_flight,
+            "requests_per_second": total / uptime if uptime else 0.0,
+            "latency": percentiles(list(self.latencies)),
+            "nodes_expanded": percentiles(list(self.expanded)),
+            "queue_wait": percentiles(list(self.queue_waits)),
+        }
+
+
+class QueryServer():
+    def __init__(self, timeout=5.0, workers=4, policy="most-movies"):
+        self.timeout = timeout
+        self.policy = policy
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.metrics = Metrics()
+        self.routes = {
+            "/path": self.path,
+            "/names": self.names,
+            "/metrics": self.report,
+        }
+        # Build the name index now rather than racing to on first use
+        degrees.get_name_index()
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None):
+        """
+        Starts listening and returns the asyncio server.
+        """
+        if unix_socket is not None:
+            return await asyncio.start_unix_server(self.handle, unix_socket)
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def handle(self, reader, writer):
+        """
+        Answers one HTTP request, then closes the connection.
+        """
+        started = perf_counter()
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                # Headers are not needed for GET requests
+                pass
+            method, target, _ = request.decode("latin-1").split(" ", 2)
+        except (ValueError, ConnectionError):
+            writer.close()
+            return
+
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        route = self.routes.get(url.path)
+        self.metrics.requests[url.path if route else "other"] += 1
+        self.metrics.in_flight += 1
+        try:
+            if method != "GET" or route is None:
+                status, body = 404, {"error": f"no such endpoint: {method} {url.path}"}
+            else:
+                status, body = await route(params)
+        except Exception as e:
+            status, body = 500, {"error": repr(e)}
+        finally:
+            self.metrics.in_flight -= 1
+        self.metrics.statuses[status] += 1
+        self.metrics.latencies.append(perf_counter() - started)
+
+        payload = json.dumps(body).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode() + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def path(self, params):
+        source_name = params.get("source", "")
+        target_name = params.get("target", "")
+        options = MODES.get(params.get("mode", "bidirectional"))
+        if options is None:
+            return 400, {"error": f"unknown mode: {params['mode']}"}
+        try:
+            source = degrees.resolve(source_name, self.policy)
+            target = degrees.resolve(target_name, self.policy)
+        except LookupError as e:
+            return 404, {"error": str(e)}
+
+        submitted = perf_counter()
+
+        def search():
+            # Start the clock once a worker picks the query up, so time
+            # spent queued behind other searches doesn't count against it
+            self.metrics.queue_waits.append(perf_counter() - submitted)
+            stats = Deadline(self.timeout)
+            return stats, degrees.shortest_path(source, target, stats=stats, **options)
+
+        loop = asyncio.get_running_loop()
+        try:
+            stats, path = await loop.run_in_executor(self.executor, search)
+        except SearchTimeout:
+            return 504, {"error": f"search took longer than {self.timeout}s"}
+        self.metrics.expanded.append(stats.nodes_expanded)
+
+        body = {"source": source, "target": target, "degrees": None, "path": None}
+        if path is not None:
+            body["degrees"] = len(path)
+            body["path"] = [
+                {"movie_id": movie_id, "movie": degrees.movies[movie_id]["title"],
+                 "person_id": person_id, "person": degrees.people[person_id]["name"]}
+                for movie_id, person_id in path
+            ]
+        return 200, body
+
+    async def names(self, params):
+        query = params.get("q", "")
+        try:
+            limit = int(params.get("limit", 10))
+        except ValueError:
+            return 400, {"error": "limit must be a number"}
+        if params.get("fuzzy"):
+            matches = degrees.similar_names(query, limit)
+        else:
+            matches = degrees.complete_name(query, limit)
+        return 200, {"matches": [
+            {"name": degrees.people[person_id]["name"], "person_id": person_id}
+            for name in matches
+            for person_id in sorted(degrees.names[name])
+        ]}
+
+    async def report(self, params):
+        return 200, self.metrics.as_dict()
+
+
+def run_in_thread(server, host="127.0.0.1", port=0, unix_socket=None):
+    """
+    Runs server on an event loop in a daemon thread. Returns the port
+    it listens on (None for a Unix socket) and a function that stops it.
+    """
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    listening = {}
+
+    async def serve():
+        listening["server"] = await server.start(host, port, unix_socket)
+        started.set()
+
+    def run():
+        loop.run_until_complete(serve())
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(listening["server"].close)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    if unix_socket is not None:
+        return None, stop
+    return listening["server"].sockets[0].getsockname()[1], stop
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_socket = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_socket)
+
+
+def query(endpoint, params=None, host="127.0.0.1", port=DEFAULT_PORT,
+          unix_socket=None, timeout=30):
+    """
+    Sends a GET request to a running server and returns the
+    status code and decoded JSON body.
+    """
+    if unix_socket is not None:
+        connection = UnixHTTPConnection(unix_socket, timeout)
+    else:
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        target = endpoint + ("?" + urlencode(params) if params else "")
+        connection.request("GET", target)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve degrees-of-separation queries over HTTP.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix-socket", help="listen on this Unix socket instead")
+    parser.add_argument("--timeout", type=float, default=5.0,
+                        help="seconds a single search may run")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="threads running searches")
+    parser.add_argument("--disambiguate", default="most-movies",
+                        choices=["none", *degrees.DISAMBIGUATION])
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--snapshot", action="store_true")
+    args = parser.parse_args()
+
+    print("Loading data...")
+    degrees.load_data(args.directory, compact=args.compact, snapshot=args.snapshot)
+    server = QueryServer(args.timeout, args.workers, args.disambiguate)
+
+    async def serve():
+        listening = await server.start(args.host, args.port, args.unix_socket)
+        where = args.unix_socket or f"http://{args.host}:{args.port}"
+        print(f"Serving on {where}")
+        async with listening:
+            await listening.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,14 @@
+import heapq
+from collections import OrderedDict, deque
+from itertools import count
+from time import perf_counter
+
+
 class Node():
+    # Searches create one node per enqueued state, so skip the
+    # per-instance __dict__ to keep each one small
+    __slots__ = ("state", "parent", "action")
+
     def __init__(self, state, parent, action):
         self.state = state
         self.parent = parent
@@ -6,14 +16,22 @@ class Node():
 
 
 class StackFrontier():
-    def __init__(self):
-        self.frontier = []
+    def __init__(self, stats=None):
+        self.frontier = deque()
+        # Maps each state in the frontier to how many nodes hold it,
+        # so contains_state doesn't have to scan the frontier
+        self.states = {}
+        # Optional SearchStats to report the frontier's size to
+        self.stats = stats
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+        if self.stats is not None:
+            self.stats.frontier_size(len(self.frontier))
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,10 +40,17 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self._discard(node.state)
             return node
 
+    def _discard(self, state):
+        count = self.states[state] - 1
+        if count:
+            self.states[state] = count
+        else:
+            del self.states[state]
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +58,177 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self._discard(node.state)
+            return node
+
+
+class PriorityFrontier(StackFrontier):
+    """
+    Frontier backed by a binary heap that removes the node with the
+    lowest priority first, ties going to the node added first.
+    """
+
+    def __init__(self, stats=None):
+        super().__init__(stats)
+        self.frontier = []
+        self.counter = count()
+
+    def add(self, node, priority=0):
+        heapq.heappush(self.frontier, (priority, next(self.counter), node))
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+        if self.stats is not None:
+            self.stats.frontier_size(len(self.frontier))
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            _, _, node = heapq.heappop(self.frontier)
+            self._discard(node.state)
             return node
+
+
+class SearchStats():
+    """
+    Counters and timings for one search. Pass one as the stats
+    argument of a search or frontier to have them filled in; with
+    no stats object, searches skip all of this bookkeeping.
+
+    callback, if given, is called as callback(event, stats) each time
+    a BFS layer is finished ("layer") and when the search ends ("done").
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.nodes_expanded = 0
+        self.max_frontier = 0
+        self.explored = 0
+        self.layer_times = []
+        self.neighbor_time = 0.0
+        self.explored_sets = []
+        self.layer = 0
+        self.layer_started = perf_counter()
+
+    def wrap_neighbors(self, neighbors):
+        """
+        Returns neighbors wrapped to count and time each expansion.
+        """
+        def timed(state):
+            self.expanded(state)
+            started = perf_counter()
+            result = list(neighbors(state))
+            self.neighbor_time += perf_counter() - started
+            return result
+        return timed
+
+    def expanded(self, state):
+        """
+        Called before each node is expanded.
+        """
+        self.nodes_expanded += 1
+
+    def frontier_size(self, size):
+        if size > self.max_frontier:
+            self.max_frontier = size
+
+    def track(self, *explored):
+        """
+        Registers the collections a search keeps its explored
+        states in, to be measured when the search ends.
+        """
+        self.explored_sets.extend(explored)
+
+    def end_layer(self):
+        """
+        Called once the last node of a BFS layer has been expanded.
+        """
+        now = perf_counter()
+        self.layer_times.append(now - self.layer_started)
+        self.layer_started = now
+        self.layer += 1
+        if self.callback is not None:
+            self.callback("layer", self)
+
+    def finish(self):
+        """
+        Closes the last layer and records the explored set size.
+        """
+        self.layer_times.append(perf_counter() - self.layer_started)
+        self.explored = sum(len(explored) for explored in self.explored_sets)
+        self.explored_sets = []
+        if self.callback is not None:
+            self.callback("done", self)
+
+    def as_dict(self):
+        return {
+            "nodes_expanded": self.nodes_expanded,
+            "max_frontier": self.max_frontier,
+            "explored": self.explored,
+            "layer_times": self.layer_times,
+            "neighbor_time": self.neighbor_time,
+        }
+
+
+class NeighborCache():
+    """
+    Least-recently-used cache in front of a neighbors function.
+
+    budget caps the total number of neighbors kept across all cached
+    states (roughly 100 bytes each for id string pairs), evicting the
+    least recently used states first; None means no limit.
+    """
+
+    def __init__(self, neighbors, budget=None):
+        self.neighbors = neighbors
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, state):
+        entry = self.entries.get(state)
+        if entry is not None:
+            self.entries.move_to_end(state)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        entry = tuple(self.neighbors(state))
+        if self.budget is None or len(entry) <= self.budget:
+            self.entries[state] = entry
+            self.size += len(entry)
+            while self.budget is not None and self.size > self.budget:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+        return entry
+
+    def warm(self, states):
+        """
+        Fills the cache for states up front, stopping once the
+        budget is reached.
+        """
+        for state in states:
+            if self.budget is not None and self.size >= self.budget:
+                break
+            self(state)
+
+
+def percentiles(values):
+    """
+    Returns the 50th, 90th and 99th percentiles, mean and max.
+    """
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "p50": at(0.50), "p90": at(0.90), "p99": at(0.99),
+        "mean": sum(ordered) / len(ordered), "max": ordered[-1],
+    }
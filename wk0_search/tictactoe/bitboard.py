@@ -0,0 +1,227 @@
+"""
+Bitboard Tic Tac Toe engine
+
+A position is a pair of 9-bit ints (x, o), with bit 3 * i + j set when
+that player has a mark in cell (i, j). Wins are mask tests and moves
+are bit-ors, so nothing is copied or rescanned while searching.
+
+The functions named like the ones in tictactoe.py take and return the
+same nested-list boards, converting at the edges, so this module can
+stand in for it, e.g. `import bitboard as ttt` in runner.py.
+"""
+
+import tictactoe
+from tictactoe import X, O, EMPTY
+
+FULL = 0b111111111
+
+# Rows, columns and diagonals
+WINS = (
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100,
+)
+
+# WON[mask] is True if the marks in mask include a full line
+WON = [any(mask & line == line for line in WINS) for mask in range(FULL + 1)]
+
+# Positions visited by search, for measuring searches
+nodes = 0
+
+
+def encode(board):
+    """
+    Returns the (x, o) bitboard for a list board.
+    """
+    x = o = 0
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == X:
+                x |= 1 << (3 * i + j)
+            elif cell == O:
+                o |= 1 << (3 * i + j)
+    return x, o
+
+
+def decode(bits):
+    """
+    Returns the list board for an (x, o) bitboard.
+    """
+    x, o = bits
+    return [[X if x >> (3 * i + j) & 1 else O if o >> (3 * i + j) & 1 else EMPTY
+             for j in range(3)]
+            for i in range(3)]
+
+
+def bits_player(bits):
+    """
+    Returns the player to move: X when both have made as many moves.
+    """
+    x, o = bits
+    return X if bin(x).count("1") == bin(o).count("1") else O
+
+
+def bits_actions(bits):
+    """
+    Returns the cell numbers (3 * i + j) that are still empty.
+    """
+    free = ~(bits[0] | bits[1]) & FULL
+    return [cell for cell in range(9) if free >> cell & 1]
+
+
+def bits_result(bits, cell):
+    """
+    Returns the bitboard after the player to move marks cell.
+    """
+    x, o = bits
+    if bits_player(bits) == X:
+        return x | 1 << cell, o
+    return x, o | 1 << cell
+
+
+def bits_winner(bits):
+    x, o = bits
+    if WON[x]:
+        return X
+    if WON[o]:
+        return O
+    return None
+
+
+def bits_terminal(bits):
+    x, o = bits
+    return WON[x] or WON[o] or x | o == FULL
+
+
+def bits_utility(bits):
+    x, o = bits
+    return 1 if WON[x] else -1 if WON[o] else 0
+
+
+def bits_minimax(bits):
+    """
+    Returns the best cell for the player to move, or None if the
+    game is over.
+    """
+    if bits_terminal(bits):
+        return None
+    x, o = bits
+    x_to_move = bits_player(bits) == X
+    best_cell = None
+    best = -2 if x_to_move else 2
+    alpha, beta = -2, 2
+    for cell in range(9):
+        if (x | o) >> cell & 1:
+            continue
+        if x_to_move:
+            value = search(x | 1 << cell, o, False, alpha, beta)
+            if value > best:
+                best, best_cell = value, cell
+            alpha = max(alpha, best)
+        else:
+            value = search(x, o | 1 << cell, True, alpha, beta)
+            if value < best:
+                best, best_cell = value, cell
+            beta = min(beta, best)
+    return best_cell
+
+
+def search(x, o, x_to_move, alpha, beta):
+    """
+    Alpha-beta value of a position, 1 if X wins with best play,
+    -1 if O does and 0 for a draw.
+    """
+    global nodes
+    nodes += 1
+    if WON[x]:
+        return 1
+    if WON[o]:
+        return -1
+    taken = x | o
+    if taken == FULL:
+        return 0
+
+    if x_to_move:
+        value = -2
+        for cell in range(9):
+            if taken >> cell & 1:
+                continue
+            value = max(value, search(x | 1 << cell, o, False, alpha, beta))
+            alpha = max(alpha, value)
+            if beta <= alpha:
+                break
+    else:
+        value = 2
+        for cell in range(9):
+            if taken >> cell & 1:
+                continue
+            value = min(value, search(x, o | 1 << cell, True, alpha, beta))
+            beta = min(beta, value)
+            if beta <= alpha:
+                break
+    return value
+
+
+def initial_state():
+    """
+    Returns starting state of the board.
+    """
+    return tictactoe.initial_state()
+
+
+def player(board):
+    """
+    Returns player who has the next turn on a board.
+    """
+    bits = encode(board)
+    # Matches tictactoe.player, which answers X once the game is over
+    return X if bits_terminal(bits) else bits_player(bits)
+
+
+def actions(board):
+    """
+    Returns set of all possible actions (i, j) available on the board.
+    """
+    return {divmod(cell, 3) for cell in bits_actions(encode(board))}
+
+
+def result(board, action):
+    """
+    Returns the board that results from making move (i, j) on the board.
+    """
+    i, j = action
+    if not (0 <= i < 3 and 0 <= j < 3) or board[i][j] is not EMPTY:
+        raise ValueError('invalid action')
+    x, o = encode(board)
+    if player(board) == X:
+        return decode((x | 1 << (3 * i + j), o))
+    return decode((x, o | 1 << (3 * i + j)))
+
+
+def winner(board):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    return bits_winner(encode(board))
+
+
+def terminal(board):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    return bits_terminal(encode(board))
+
+
+def utility(board):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    return bits_utility(encode(board))
+
+
+def minimax(board):
+    """
+    Returns the optimal action for the current player on the board.
+    """
+    cell = bits_minimax(encode(board))
+    return None if cell is None else divmod(cell, 3)
@@ -0,0 +1,62 @@
+"""
+Writes the perfect-play opening book that tictactoe.minimax reads.
+
+Solves every reachable position once, up to symmetry, and stores its
+best move and value in a table indexed by canonical board key:
+
+    python book.py [path]
+
+The book is small enough to keep in the repository; minimax searches
+as before when it is missing.
+"""
+
+import math
+import sys
+
+import tictactoe as ttt
+
+
+def solve():
+    """
+    Returns {canonical key: (best move on the canonical board, value)}
+    for every reachable board where the game isn't over.
+    """
+    table = ttt.TranspositionTable(max_entries=3 ** 9)
+    solved = {}
+    boards = [ttt.initial_state()]
+    while boards:
+        board = boards.pop()
+        if ttt.terminal(board):
+            continue
+        key, symmetry, _ = ttt.canonical(board)
+        if key in solved:
+            continue
+        if ttt.player(board) == ttt.X:
+            value, move = ttt.max_value(board, -math.inf, math.inf, table)
+        else:
+            value, move = ttt.min_value(board, -math.inf, math.inf, table)
+        solved[key] = (ttt.transform(move, symmetry), value)
+        boards.extend(ttt.result(board, action) for action in ttt.actions(board))
+    return solved
+
+
+def encode(solved):
+    """
+    Returns the book file contents for solved positions.
+    """
+    table = bytearray(3 ** 9)
+    for key, ((i, j), value) in solved.items():
+        table[key] = 1 + (3 * i + j) * 4 + (value + 1)
+    return ttt.BOOK_MAGIC + bytes([ttt.BOOK_VERSION]) + bytes(table)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else ttt.BOOK_PATH
+    solved = solve()
+    with open(path, "wb") as f:
+        f.write(encode(solved))
+    print(f"Wrote {len(solved)} positions to {path}")
+
+
+if __name__ == "__main__":
+    main()
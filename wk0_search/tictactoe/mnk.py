@@ -0,0 +1,278 @@
+"""
+m,n,k-game engine: Tic Tac Toe on an m-row, n-column board where k
+marks in a row win, e.g. Game(4, 4, 3) or Game(15, 15, 5) for gomoku.
+
+A Game has the functions of tictactoe.py as methods, plus X, O and
+EMPTY, so runner2.py can use one in place of the module. minimax
+deepens an alpha-beta search one move at a time until time_limit
+seconds have passed, scoring boards where it stops with evaluate,
+and only checks the lines through the last move for a win.
+"""
+
+import math
+from time import perf_counter
+
+from tictactoe import X, O, EMPTY
+
+# Score of a board X has won; wins in fewer moves score higher, and
+# evaluators must stay well below it
+WIN = 10 ** 9
+
+# Right, down, and the two diagonals
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def open_lines(game, board):
+    """
+    Default evaluator. Every run of k cells that only one player has
+    marks in is worth 10 ** (number of marks) to that player; returns
+    X's total minus O's.
+    """
+    score = 0
+    for line in game.lines:
+        x_marks = o_marks = 0
+        for i, j in line:
+            cell = board[i][j]
+            if cell == X:
+                x_marks += 1
+            elif cell == O:
+                o_marks += 1
+        if not o_marks and x_marks:
+            score += 10 ** x_marks
+        elif not x_marks and o_marks:
+            score -= 10 ** o_marks
+    return score
+
+
+class Game():
+    X = X
+    O = O
+    EMPTY = EMPTY
+
+    def __init__(self, m=3, n=3, k=3, time_limit=1.0, evaluate=open_lines,
+                 reach=None, max_depth=None):
+        """
+        evaluate(game, board) scores a board the search stops at, above
+        zero if it favors X. On boards of more than 36 cells, the search
+        only tries cells within reach (default 2) of a mark.
+        """
+        if not 1 <= k <= max(m, n):
+            raise ValueError(f"cannot get {k} in a row on a {m}x{n} board")
+        self.m = m
+        self.n = n
+        self.k = k
+        self.time_limit = time_limit
+        self.evaluate = evaluate
+        if reach is None:
+            reach = 2 if m * n > 36 else max(m, n)
+        self.reach = reach
+        self.max_depth = max_depth
+
+        # Every run of k cells a player could win with
+        self.lines = [
+            [(i + di * step, j + dj * step) for step in range(k)]
+            for i in range(m) for j in range(n) for di, dj in DIRECTIONS
+            if 0 <= i + di * (k - 1) < m and 0 <= j + dj * (k - 1) < n
+        ]
+
+        # Filled in by minimax
+        self.nodes = 0
+        self.depth_reached = 0
+        self.deadline = math.inf
+        self.cut = False
+
+    def initial_state(self):
+        """
+        Returns starting state of the board.
+        """
+        return [[EMPTY] * self.n for _ in range(self.m)]
+
+    def player(self, board):
+        """
+        Returns player who has the next turn on a board.
+        """
+        if self.terminal(board):
+            return X
+        count_diff = sum(row.count(X) - row.count(O) for row in board)
+        return O if count_diff > 0 else X
+
+    def actions(self, board):
+        """
+        Returns set of all possible actions (i, j) available on the board.
+        """
+        return {(i, j) for i, row in enumerate(board)
+                for j, cell in enumerate(row) if cell is EMPTY}
+
+    def result(self, board, action):
+        """
+        Returns the board that results from making move (i, j) on the board.
+        """
+        if action not in self.actions(board):
+            raise ValueError('invalid action')
+        new_board = [list(row) for row in board]
+        new_board[action[0]][action[1]] = self.player(board)
+        return new_board
+
+    def winner(self, board):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell is not EMPTY and self.wins_at(board, i, j):
+                    return cell
+        return None
+
+    def terminal(self, board):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        return (self.winner(board) is not None
+                or not any(EMPTY in row for row in board))
+
+    def utility(self, board):
+        """
+        Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+        """
+        win = self.winner(board)
+        return 1 if win == X else -1 if win == O else 0
+
+    def wins_at(self, board, i, j):
+        """
+        Returns True if the mark at (i, j) is part of k in a row.
+        """
+        mark = board[i][j]
+        for di, dj in DIRECTIONS:
+            run = 1
+            for sign in (1, -1):
+                a, b = i + sign * di, j + sign * dj
+                while 0 <= a < self.m and 0 <= b < self.n and board[a][b] == mark:
+                    run += 1
+                    a, b = a + sign * di, b + sign * dj
+            if run >= self.k:
+                return True
+        return False
+
+    def ordered_moves(self, board):
+        """
+        Returns the empty cells within reach of a mark, or every cell
+        on an empty board, with cells close to many marks first and
+        ties going to the cell nearest the center.
+        """
+        m, n, reach = self.m, self.n, self.reach
+        weight = {}
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell is EMPTY:
+                    continue
+                for a in range(max(0, i - reach), min(m, i + reach + 1)):
+                    for b in range(max(0, j - reach), min(n, j + reach + 1)):
+                        if board[a][b] is EMPTY:
+                            closeness = reach + 1 - max(abs(a - i), abs(b - j))
+                            weight[(a, b)] = weight.get((a, b), 0) + closeness
+        if not weight:
+            weight = {(i, j): 0 for i in range(m) for j in range(n)
+                      if board[i][j] is EMPTY}
+
+        center_i, center_j = (m - 1) / 2, (n - 1) / 2
+        return sorted(weight, key=lambda move: (
+            -weight[move], abs(move[0] - center_i) + abs(move[1] - center_j)))
+
+    def minimax(self, board):
+        """
+        Returns the best action found for the current player within
+        time_limit seconds, or None if the game is over.
+        """
+        if self.terminal(board):
+            return None
+        moves = self.ordered_moves(board)
+        if len(moves) == 1:
+            return moves[0]
+
+        self.deadline = perf_counter() + self.time_limit
+        self.nodes = 0
+        self.depth_reached = 0
+        x_to_move = self.player(board) == X
+        empty = sum(row.count(EMPTY) for row in board)
+        max_depth = empty if self.max_depth is None else min(self.max_depth, empty)
+
+        best_move = moves[0]
+        for depth in range(1, max_depth + 1):
+            self.cut = False
+            try:
+                value, best_move = self.root(
+                    [list(row) for row in board], moves, depth, x_to_move, empty)
+            except SearchTimeout:
+                break
+            self.depth_reached = depth
+            # Searching deeper can't change a forced result, or anything
+            # once every line was played out to the end
+            if not self.cut or abs(value) > WIN - self.m * self.n:
+                break
+            # Try the best move first next time, for earlier cutoffs
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+        return best_move
+
+    def root(self, board, moves, depth, x_to_move, empty):
+        """
+        Searches every move on the board to depth, returning the best
+        value and move.
+        """
+        alpha, beta = -math.inf, math.inf
+        mark = X if x_to_move else O
+        best_value, best_move = None, None
+        for move in moves:
+            i, j = move
+            board[i][j] = mark
+            value = self.search(board, move, depth - 1, 1, alpha, beta, empty - 1)
+            board[i][j] = EMPTY
+            if x_to_move:
+                if best_move is None or value > best_value:
+                    best_value, best_move = value, move
+                alpha = max(alpha, value)
+            else:
+                if best_move is None or value < best_value:
+                    best_value, best_move = value, move
+                beta = min(beta, value)
+        return best_value, best_move
+
+    def search(self, board, last, depth, ply, alpha, beta, empty):
+        """
+        Alpha-beta value of the board after the move last, searching
+        depth more moves. Marks are placed and removed on board itself.
+        """
+        self.nodes += 1
+        if perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        i, j = last
+        if self.wins_at(board, i, j):
+            return WIN - ply if board[i][j] == X else ply - WIN
+        if empty == 0:
+            return 0
+        if depth == 0:
+            self.cut = True
+            return self.evaluate(self, board)
+
+        x_to_move = board[i][j] == O
+        mark = X if x_to_move else O
+        value = -math.inf if x_to_move else math.inf
+        for move in self.ordered_moves(board):
+            a, b = move
+            board[a][b] = mark
+            child = self.search(board, move, depth - 1, ply + 1, alpha, beta, empty - 1)
+            board[a][b] = EMPTY
+            if x_to_move:
+                value = max(value, child)
+                alpha = max(alpha, value)
+            else:
+                value = min(value, child)
+                beta = min(beta, value)
+            if beta <= alpha:
+                break
+        return value
@@ -0,0 +1,207 @@
+"""
+Root-split minimax: searches each move from the current board in its
+own worker process and picks the best.
+
+Workers share the best score found so far. Each move is searched with
+it as the bound to beat, so once one move scores well, the others only
+have to prove they are no better, which alpha-beta does much faster:
+
+    with RootSplitter(processes=4) as splitter:
+        move = splitter.minimax(board)
+
+Works with tictactoe.py, or with an mnk.Game searched to a fixed depth.
+Run this file to benchmark the speedup by number of processes against
+the serial max_value and min_value:
+
+    python parallel.py --processes 1,2,4,8
+    python parallel.py --game 4 4 3 --depth 6 --output parallel.json
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+from time import perf_counter
+
+import tictactoe as ttt
+from mnk import Game
+
+# Best score any worker has proven for the player to move at the root,
+# shared by all workers and set in each one
+best = None
+
+# The mnk.Game being searched, or None for tictactoe.py
+game = None
+
+
+def init_worker(shared_best, shared_game):
+    global best, game
+    best = shared_best
+    game = shared_game
+    if game is not None:
+        game.deadline = math.inf
+
+
+def score_move(task):
+    """
+    Returns (move, score, exact) for one move on the board: the score is
+    the board's value after the move, negated if O moved so higher is
+    always better, and exact is False if the move was only shown to be
+    no better than a score another worker had already proven.
+    """
+    board, move, depth = task
+    to_beat = best.value
+    x_to_move = (game or ttt).player(board) == ttt.X
+    board = [list(row) for row in board]
+    i, j = move
+    board[i][j] = ttt.X if x_to_move else ttt.O
+
+    if game is None:
+        if x_to_move:
+            value, _ = ttt.min_in_place(board, to_beat, math.inf)
+        else:
+            value, _ = ttt.max_in_place(board, -math.inf, -to_beat)
+    else:
+        empty = sum(row.count(ttt.EMPTY) for row in board)
+        if x_to_move:
+            value = game.search(board, move, depth - 1, 1, to_beat, math.inf, empty)
+        else:
+            value = game.search(board, move, depth - 1, 1, -math.inf, -to_beat, empty)
+
+    score = value if x_to_move else -value
+    with best.get_lock():
+        if score > best.value:
+            best.value = score
+    return move, score, score > to_beat
+
+
+class RootSplitter():
+    """
+    Pool of worker processes for root-split searches, kept between
+    calls to minimax so each call only pays for the search itself.
+    """
+
+    def __init__(self, processes=None, game=None):
+        self.game = game
+        self.best = multiprocessing.Value("d", -math.inf)
+        self.pool = multiprocessing.Pool(processes, initializer=init_worker,
+                                          initargs=(self.best, game))
+
+    def minimax(self, board, depth=None):
+        """
+        Returns the optimal action for the current player on the board,
+        or with an mnk.Game, the best one found searching depth moves
+        ahead (by default to the end of the game).
+        """
+        rules = self.game or ttt
+        if rules.terminal(board):
+            return None
+        moves = sorted(rules.actions(board))
+        if depth is None:
+            depth = len(moves)
+
+        with self.best.get_lock():
+            self.best.value = -math.inf
+        results = self.pool.map(score_move, [(board, move, depth) for move in moves],
+                                chunksize=1)
+        # Moves that only proved a bound can't be better than an exact one
+        _, best_move = max((score, move) for move, score, exact in results if exact)
+        return best_move
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def serial_minimax(board, game=None, depth=None):
+    """
+    Returns the move the serial search finds, for comparison: max_value
+    or min_value for tictactoe.py, or Game.root to depth for a Game.
+    """
+    if game is None:
+        if ttt.player(board) == ttt.X:
+            _, move = ttt.max_value(board, -math.inf, math.inf)
+        else:
+            _, move = ttt.min_value(board, -math.inf, math.inf)
+        return move
+
+    moves = sorted(game.actions(board))
+    empty = len(moves)
+    game.deadline = math.inf
+    _, move = game.root([list(row) for row in board], moves,
+                        depth or empty, game.player(board) == ttt.X, empty)
+    return move
+
+
+def openings(rules, plies):
+    """
+    Returns every board reachable in exactly plies moves that isn't
+    over, in a fixed order.
+    """
+    boards = [rules.initial_state()]
+    for _ in range(plies):
+        boards = [rules.result(board, move) for board in boards
+                  for move in sorted(rules.actions(board))]
+        boards = [board for board in boards if not rules.terminal(board)]
+    return boards
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark root-split minimax against the serial search.")
+    parser.add_argument("--game", type=int, nargs=3, metavar=("M", "N", "K"),
+                        help="search an mnk.Game instead of tictactoe.py")
+    parser.add_argument("--depth", type=int,
+                        help="moves to search ahead (default: to the end)")
+    parser.add_argument("--plies", type=int, default=1,
+                        help="search every board this many moves in")
+    parser.add_argument("--processes", default=f"1,2,4,{os.cpu_count()}",
+                        help="comma-separated worker counts to compare")
+    parser.add_argument("--output", help="file to write JSON results to")
+    args = parser.parse_args()
+
+    rules = Game(*args.game) if args.game else None
+    boards = openings(rules or ttt, args.plies)
+
+    started = perf_counter()
+    for board in boards:
+        serial_minimax(board, rules, args.depth)
+    serial = perf_counter() - started
+    print(f"serial      {serial:8.3f}s  {len(boards)} boards")
+
+    results = {
+        "config": {
+            "game": args.game or [3, 3, 3], "depth": args.depth,
+            "boards": len(boards), "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "serial_seconds": serial,
+        "runs": []
+    }
+    counts = sorted({int(count) for count in args.processes.split(",")})
+    for processes in counts:
+        with RootSplitter(processes, rules) as splitter:
+            started = perf_counter()
+            for board in boards:
+                splitter.minimax(board, args.depth)
+            seconds = perf_counter() - started
+        results["runs"].append({"processes": processes, "seconds": seconds,
+                                "speedup": serial / seconds})
+        print(f"{processes:2} process{'es' if processes > 1 else '  '} "
+              f"{seconds:8.3f}s  speedup {serial / seconds:5.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
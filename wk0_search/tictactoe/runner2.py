@@ -1,10 +1,20 @@
 import pygame # type: ignore
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 import tictactoe as ttt
+import mnk
+
+# python runner2.py m n k plays k in a row on an m-row, n-column board
+if len(sys.argv) == 4:
+    ttt = mnk.Game(*(int(arg) for arg in sys.argv[1:]))
+
+board = ttt.initial_state()
+rows, cols = len(board), len(board[0])
+tile_size = min(80, 480 // max(rows, cols))
 
 pygame.init()
-size = width, height = 600, 400
+size = width, height = max(600, cols * tile_size + 80), max(400, rows * tile_size + 160)
 
 # Colors
 black = (0, 0, 0)
@@ -14,11 +24,14 @@ screen = pygame.display.set_mode(size)
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
-moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
+moveFont = pygame.font.Font("OpenSans-Regular.ttf", tile_size * 3 // 4)
 
 user = None
-board = ttt.initial_state()
 ai_turn = False
+# The AI searches on another thread so the window keeps responding
+executor = ThreadPoolExecutor(max_workers=1)
+ai_move = None
+ai_started = 0
 game_mode = None
 
 while True:
@@ -97,13 +110,12 @@ while True:
 
     else:
         # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
+        tile_origin = (width / 2 - (cols / 2 * tile_size),
+                       height / 2 - (rows / 2 * tile_size))
         tiles = []
-        for i in range(3):
+        for i in range(rows):
             row = []
-            for j in range(3):
+            for j in range(cols):
                 rect = pygame.Rect(
                     tile_origin[0] + j * tile_size,
                     tile_origin[1] + i * tile_size,
@@ -146,10 +158,13 @@ while True:
             # AI move
             if user != player and not game_over:
                 if ai_turn:
-                    time.sleep(0.8)
-                    move = ttt.minimax(board)
-                    board = ttt.result(board, move)
-                    ai_turn = False
+                    if ai_move is None:
+                        ai_move = executor.submit(ttt.minimax, board)
+                        ai_started = time.time()
+                    elif ai_move.done() and time.time() - ai_started >= 0.8:
+                        board = ttt.result(board, ai_move.result())
+                        ai_move = None
+                        ai_turn = False
                 else:
                     ai_turn = True
             
@@ -157,8 +172,8 @@ while True:
             click, _, _ = pygame.mouse.get_pressed()
             if click == 1 and user == player and not game_over:
                 mouse = pygame.mouse.get_pos()
-                for i in range(3):
-                    for j in range(3):
+                for i in range(rows):
+                    for j in range(cols):
                         if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                             board = ttt.result(board, (i, j))
                             # ai_turn = True
@@ -168,8 +183,8 @@ while True:
             click, _, _ = pygame.mouse.get_pressed()
             if click == 1 and not game_over:
                 mouse = pygame.mouse.get_pos()
-                for i in range(3):
-                    for j in range(3):
+                for i in range(rows):
+                    for j in range(cols):
                         if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                             board = ttt.result(board, (i, j))
                             time.sleep(0.2)  # Small delay to prevent double clicks
@@ -190,5 +205,6 @@ while True:
                     user = None
                     board = ttt.initial_state()
                     ai_turn = False
+                    ai_move = None
 
     pygame.display.flip()
\ No newline at end of file
@@ -5,11 +5,53 @@ Tic Tac Toe Player
 
 import math
 import copy
+import os
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Kinds of value a transposition table entry holds: the exact value,
+# or only a lower or upper bound when alpha-beta cut the search short
+EXACT = "exact"
+LOWER = "lower"
+UPPER = "upper"
+
+# Written by book.py: for each canonical board key, 0 if the board is
+# not in the book, else 1 + (3 * i + j) * 4 + (value + 1) for the best
+# move (i, j) on the canonical board and the board's value
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+BOOK_MAGIC = b"TTTBOOK\0"
+BOOK_VERSION = 1
+
+# The 8 rotations and reflections of the board, as maps of a cell
+# (i, j) to where it ends up
+SYMMETRIES = (
+    lambda i, j: (i, j),
+    lambda i, j: (j, 2 - i),
+    lambda i, j: (2 - i, 2 - j),
+    lambda i, j: (2 - j, i),
+    lambda i, j: (i, 2 - j),
+    lambda i, j: (2 - i, j),
+    lambda i, j: (j, i),
+    lambda i, j: (2 - j, 2 - i),
+)
+
+# INVERSES[s] is the symmetry that undoes SYMMETRIES[s]
+INVERSES = tuple(
+    next(t for t, undo in enumerate(SYMMETRIES)
+         if all(undo(*move(i, j)) == (i, j) for i in range(3) for j in range(3)))
+    for move in SYMMETRIES
+)
+
+# WEIGHTS[s][3 * i + j] is the base 3 place value that cell (i, j)
+# takes once the board is transformed by SYMMETRIES[s]
+WEIGHTS = tuple(
+    tuple(3 ** (8 - 3 * a - b) for a, b in
+          (move(i, j) for i in range(3) for j in range(3)))
+    for move in SYMMETRIES
+)
+
 
 def initial_state():
     """
@@ -109,47 +151,284 @@ def utility(board):
     
 
 
-def minimax(board):
+class TranspositionTable():
+    """
+    Results of earlier searches, keyed by canonical board, so
+    positions reached through different move orders, in other
+    orientations or in later calls to minimax are not searched again.
+    Best moves are stored for the board in its canonical orientation.
+
+    Holds at most max_entries positions, dropping the oldest first.
+    """
+
+    def __init__(self, max_entries=100_000):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def probe(self, key):
+        """
+        Returns the stored (value, bound, move) for key, or None.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def store(self, key, value, alpha, beta, move):
+        """
+        Records the value searched with the window (alpha, beta), and
+        whether it is exact or only a bound.
+        """
+        if value <= alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        if key not in self.entries and len(self.entries) >= self.max_entries:
+            del self.entries[next(iter(self.entries))]
+            self.evictions += 1
+        self.entries[key] = (value, bound, move)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Shared by every call to minimax in this process
+transpositions = TranspositionTable()
+
+# Loaded from BOOK_PATH on first use
+opening_book = None
+
+# Positions visited by max_value and min_value, for measuring searches
+nodes = 0
+
+
+def canonical(board):
+    """
+    Returns the board's key, which symmetry gives its canonical
+    orientation, and the symmetries that leave the board unchanged.
+
+    The key is the smallest of the board's 8 orientations read as a
+    base 3 number, with 0 for EMPTY, 1 for X and 2 for O, so
+    symmetrical boards share a key.
+    """
+    digits = [1 if cell == X else 2 if cell == O else 0
+              for row in board for cell in row]
+    keys = [sum(d * w for d, w in zip(digits, weights)) for weights in WEIGHTS]
+    key = min(keys)
+    same = [s for s, k in enumerate(keys) if k == keys[0]]
+    return key, keys.index(key), same
+
+
+def transform(move, symmetry):
+    """
+    Returns where move (i, j) ends up under SYMMETRIES[symmetry].
+    """
+    if move is None:
+        return None
+    return SYMMETRIES[symmetry](*move)
+
+
+def load_book(path=BOOK_PATH):
+    """
+    Returns the table saved by book.py, or an empty one if the file is
+    missing or was written in another format.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return b""
+    prefix = len(BOOK_MAGIC)
+    if data[:prefix] != BOOK_MAGIC or data[prefix:prefix + 1] != bytes([BOOK_VERSION]):
+        return b""
+    return data[prefix + 1:]
+
+
+def get_opening_book():
+    global opening_book
+    if opening_book is None:
+        opening_book = load_book()
+    return opening_book
+
+
+def book_move(board):
+    """
+    Returns the best move on the board from the opening book, or None
+    if the book is missing or doesn't have the board.
+    """
+    table = get_opening_book()
+    if not table:
+        return None
+    key, symmetry, _ = canonical(board)
+    entry = table[key]
+    if not entry:
+        return None
+    return transform(divmod((entry - 1) >> 2, 3), INVERSES[symmetry])
+
+
+def cutoff(entry, alpha, beta):
+    """
+    Returns True if a table entry settles the search of its position
+    within the window (alpha, beta).
+    """
+    value, bound, _ = entry
+    return (bound == EXACT
+            or bound == LOWER and value >= beta
+            or bound == UPPER and value <= alpha)
+
+
+def distinct_actions(board, first, same):
+    """
+    Returns the actions on the board, leaving out moves that a
+    symmetry in same maps onto one already listed, since they lead to
+    equivalent boards. first, the best move from an earlier search,
+    goes first since it most likely causes a cutoff.
+    """
+    moves = list(actions(board))
+    if first in moves:
+        moves.remove(first)
+        moves.insert(0, first)
+    if len(same) == 1:
+        return moves
+
+    distinct = []
+    covered = set()
+    for move in moves:
+        if move not in covered:
+            distinct.append(move)
+            covered.update(transform(move, s) for s in same)
+    return distinct
+
+
+def minimax(board, cache=True):
     """
     Returns the optimal action for the current player on the board.
+
+    With cache, the move comes from the opening book if it has the
+    board. Otherwise positions are looked up in and added to the
+    shared transpositions table, and moves that lead to boards
+    symmetrical to each other are searched only once.
     """
+    if cache:
+        move = book_move(board)
+        if move is not None:
+            return move
+    table = transpositions if cache else None
     if player(board) == X:
-        _, best_move = max_value(board, float('-inf'), float('inf'))
+        _, best_move = max_value(board, float('-inf'), float('inf'), table)
     else:
-        _, best_move = min_value(board, float('-inf'), float('inf'))
+        _, best_move = min_value(board, float('-inf'), float('inf'), table)
     
     return best_move
         
         
-def max_value(board, alpha, beta):
-    if terminal(board):
-        return utility(board), None
+def max_value(board, alpha, beta, table=None):
+    """
+    Returns the value of the board with X to move and X's best move.
+    Searches a copy of the board, placing and removing marks on it.
+    """
+    return max_in_place([list(row) for row in board], alpha, beta, table)
+
+
+def min_value(board, alpha, beta, table=None):
+    """
+    Returns the value of the board with O to move and O's best move.
+    Searches a copy of the board, placing and removing marks on it.
+    """
+    return min_in_place([list(row) for row in board], alpha, beta, table)
+
+
+def max_in_place(board, alpha, beta, table=None):
+    global nodes
+    nodes += 1
+    win = winner(board)
+    if win is not None:
+        return (1 if win == X else -1), None
+    if not any(EMPTY in row for row in board):
+        return 0, None
+
+    moves = actions(board)
+    if table is not None:
+        key, symmetry, same = canonical(board)
+        entry = table.probe(key)
+        first = None
+        if entry is not None:
+            first = transform(entry[2], INVERSES[symmetry])
+            if cutoff(entry, alpha, beta):
+                return entry[0], first
+        moves = distinct_actions(board, first, same)
+        alpha_start, beta_start = alpha, beta
     
     v = float('-inf')
     best_move = None
-    for action in actions(board):
-        max_val, _ = min_value(result(board, action), alpha, beta)
+    for action in moves:
+        # Moves come from actions, so skip result's checks and copy
+        i, j = action
+        board[i][j] = X
+        max_val, _ = min_in_place(board, alpha, beta, table)
+        board[i][j] = EMPTY
         if max_val > v:
             v = max_val
             best_move = action
         alpha = max(alpha, v)
         if beta <= alpha:
             break            
+    if table is not None:
+        table.store(key, v, alpha_start, beta_start,
+                    transform(best_move, symmetry))
     return v, best_move
 
-def min_value(board, alpha, beta):
-    if terminal(board):
-        return utility(board), None
+def min_in_place(board, alpha, beta, table=None):
+    global nodes
+    nodes += 1
+    win = winner(board)
+    if win is not None:
+        return (1 if win == X else -1), None
+    if not any(EMPTY in row for row in board):
+        return 0, None
+
+    moves = actions(board)
+    if table is not None:
+        key, symmetry, same = canonical(board)
+        entry = table.probe(key)
+        first = None
+        if entry is not None:
+            first = transform(entry[2], INVERSES[symmetry])
+            if cutoff(entry, alpha, beta):
+                return entry[0], first
+        moves = distinct_actions(board, first, same)
+        alpha_start, beta_start = alpha, beta
     
     v = float('inf')
     best_move = None
-    for action in actions(board):
-        # v = min(v, max_value(result(board,action)))
-        min_val, _ = max_value(result(board, action), alpha, beta)
+    for action in moves:
+        i, j = action
+        board[i][j] = O
+        min_val, _ = max_in_place(board, alpha, beta, table)
+        board[i][j] = EMPTY
         if min_val < v:
             v = min_val
             best_move = action
         beta = min(v, beta)
         if beta <= alpha:
             break
+    if table is not None:
+        table.store(key, v, alpha_start, beta_start,
+                    transform(best_move, symmetry))
     return v, best_move
@@ -0,0 +1,191 @@
+"""
+Headless self-play tournament between Tic Tac Toe engines.
+
+Every engine plays every engine, itself included, as both X and O,
+across worker processes, with no pygame window:
+
+    python tournament.py --games 200 --processes 4 --output results.json
+
+Reports games per second, nodes searched and latency per move, and
+wins, losses and draws, as text and optionally as JSON so runs can be
+compared over time. None of the engines but random should ever lose.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import random
+from collections import Counter, defaultdict
+from time import perf_counter
+
+import bitboard
+import tictactoe as ttt
+
+# Each engine returns its move on a board; rng is the game's random
+# number generator
+ENGINES = {
+    "minimax": lambda board, rng: ttt.minimax(board, cache=False),
+    "cached": lambda board, rng: ttt.minimax(board),
+    "bitboard": lambda board, rng: bitboard.minimax(board),
+    "random": lambda board, rng: rng.choice(sorted(ttt.actions(board))),
+}
+
+# Modules whose nodes counter an engine's searches add to
+NODE_COUNTERS = {
+    "minimax": ttt,
+    "cached": ttt,
+    "bitboard": bitboard,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play Tic Tac Toe engines against each other.")
+    parser.add_argument("--engines", default=",".join(ENGINES),
+                        help=f"comma-separated, from {', '.join(ENGINES)}")
+    parser.add_argument("--games", type=int, default=100,
+                        help="games per pairing of X and O engines")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="file to write JSON results to")
+    args = parser.parse_args()
+
+    engines = args.engines.split(",")
+    for name in engines:
+        if name not in ENGINES:
+            parser.error(f"unknown engine: {name}")
+
+    results = run_tournament(engines, args.games, args.processes, args.seed)
+    print(summary(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def play(task):
+    """
+    Plays one game and returns the engines, the winner, and for each
+    move the engine that made it, its latency and the nodes searched
+    (None for engines that don't count them).
+    """
+    x_engine, o_engine, seed = task
+    rng = random.Random(seed)
+    board = ttt.initial_state()
+    moves = []
+    while not ttt.terminal(board):
+        name = x_engine if ttt.player(board) == ttt.X else o_engine
+        counter = NODE_COUNTERS.get(name)
+        nodes = counter.nodes if counter else 0
+        started = perf_counter()
+        move = ENGINES[name](board, rng)
+        latency = perf_counter() - started
+        moves.append((name, latency, counter.nodes - nodes if counter else None))
+        board = ttt.result(board, move)
+    return x_engine, o_engine, ttt.winner(board), moves
+
+
+def run_tournament(engines, games, processes=None, seed=1):
+    """
+    Plays games games for every ordered pair of engines and returns
+    the aggregated results.
+    """
+    tasks = [
+        (x_engine, o_engine, seed * 1_000_003 + n)
+        for x_engine, o_engine in itertools.product(engines, repeat=2)
+        for n in range(games)
+    ]
+
+    latencies = defaultdict(list)
+    nodes = defaultdict(list)
+    records = defaultdict(Counter)
+    pairings = defaultdict(Counter)
+    started = perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        for x_engine, o_engine, winner, moves in pool.imap_unordered(
+                play, tasks, chunksize=max(1, len(tasks) // 64)):
+            for name, latency, searched in moves:
+                latencies[name].append(latency)
+                if searched is not None:
+                    nodes[name].append(searched)
+            pairing = pairings[f"{x_engine} vs {o_engine}"]
+            if winner is None:
+                pairing["draws"] += 1
+                records[x_engine]["draws"] += 1
+                records[o_engine]["draws"] += 1
+            else:
+                winning, losing = ((x_engine, o_engine) if winner == ttt.X
+                                   else (o_engine, x_engine))
+                pairing["x_wins" if winner == ttt.X else "o_wins"] += 1
+                records[winning]["wins"] += 1
+                records[losing]["losses"] += 1
+    seconds = perf_counter() - started
+
+    return {
+        "config": {
+            "engines": engines, "games_per_pairing": games,
+            "processes": processes or multiprocessing.cpu_count(),
+            "seed": seed, "python": platform.python_version(),
+        },
+        "games": len(tasks),
+        "seconds": seconds,
+        "games_per_second": len(tasks) / seconds,
+        "engines": {
+            name: {
+                "moves": len(latencies[name]),
+                "latency": percentiles(latencies[name]),
+                "nodes_per_move": percentiles(nodes[name]),
+                "wins": records[name]["wins"],
+                "losses": records[name]["losses"],
+                "draws": records[name]["draws"],
+            }
+            for name in engines
+        },
+        "pairings": {
+            pairing: {"x_wins": counts["x_wins"], "o_wins": counts["o_wins"],
+                      "draws": counts["draws"]}
+            for pairing, counts in pairings.items()
+        },
+    }
+
+
+def percentiles(values):
+    """
+    Returns the 50th, 90th and 99th percentiles, mean and max.
+
+    Same as percentiles in degrees/util.py, which this project can't
+    import since each project runs from its own directory; keep the
+    two in step so their latency reports stay comparable.
+    """
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "p50": at(0.50), "p90": at(0.90), "p99": at(0.99),
+        "mean": sum(ordered) / len(ordered), "max": ordered[-1],
+    }
+
+
+def summary(results):
+    lines = [f"{results['games']} games in {results['seconds']:.2f}s "
+             f"({results['games_per_second']:.1f} games/s)"]
+    for name, stats in results["engines"].items():
+        latency = stats["latency"]
+        line = (f"{name:10} W {stats['wins']:5} L {stats['losses']:5} "
+                f"D {stats['draws']:5}  "
+                f"p50 {latency['p50'] * 1000:8.3f}ms "
+                f"p99 {latency['p99'] * 1000:8.3f}ms")
+        if stats["nodes_per_move"]:
+            line += f"  nodes/move {stats['nodes_per_move']['mean']:9.1f}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    main()